@@ -1,12 +1,6 @@
 #!/bin/bash
 
-if [ `date +%H:%M` == "06:15" ]
-then
-    echo "***REMOVED******REMOVED*** Cronjob Started ***REMOVED******REMOVED******"
-
-    python ${OPENSHIFT_REPO_DIR}/scraper/main.py
-
-    echo "***REMOVED******REMOVED*** Cronjob Executed ***REMOVED******REMOVED******"
-fi
-
-
+# watchdog: start the scheduler making the daily poem unless it is already running, checking its lock here so that no
+# python process is started every minute; the scheduler takes the lock itself and exits right away if it lost a race
+flock -n ${OPENSHIFT_DATA_DIR}scheduler.lock true || exit 0
+nohup python ${OPENSHIFT_REPO_DIR}/scraper/scheduler.py >> ${OPENSHIFT_DATA_DIR}scheduler.log 2>&1 &
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark for the noun extraction of the scraper.
+
+Compares the throughput of the noun extraction in scraper.py (precompiled pattern on unicode text, set-based filtering
+of forbidden words) with the previous implementation (pattern compiled for every paragraph, UTF-8 round trip, list-based
+filtering) on a large synthetic corpus of German words taken from the lexicon.
+
+Usage:
+    python benchmarks/bench_nouns.py [no. of paragraphs]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraper'))
+
+from lexicon import load_lexicon
+from scraper import count_nouns, _forbidden_words
+
+
+def make_corpus(no_of_paragraphs, seed=0):
+    """Make a reproducible corpus of German paragraphs.
+
+    Args:
+        no_of_paragraphs: No. of paragraphs in the corpus.
+        seed: Seed of the random generator.
+
+    Returns:
+        A list of unicode strings.
+    """
+    rnd = random.Random(seed)
+    nouns = sorted(word for word in load_lexicon() if word.istitle())
+    others = list(_forbidden_words) + [u'wird', u'hat', u'sagte', u'neue', u'heute', u'rund', u'mehr']
+    corpus = []
+    for _ in range(no_of_paragraphs):
+        sentences = []
+        for _ in range(rnd.randint(2, 5)):
+            words = [rnd.choice(nouns) if rnd.random() < 0.3 else rnd.choice(others)
+                     for _ in range(rnd.randint(6, 20))]
+            words[0] = words[0].title()
+            sentences.append(u' '.join(words) + u'.')
+        corpus.append(u' '.join(sentences))
+    return corpus
+
+
+def count_nouns_legacy(paragraphs):
+    """Count nouns the way scraper.py did before, for comparison."""
+    all_sentences = [paragraph.encode('utf-8') for paragraph in paragraphs]
+    all_nouns = []
+    for sentence in all_sentences:
+        nouns = re.compile('([A-Z][A-Za-z0-9\-äöüÄÖÜßèáàéôëêâîûùÿæçïœóåűúőíðþýøìõãòąćęłńśźżăşșţțğıčůďžěňřšťİ]+)',
+                           re.UNICODE).findall(sentence)
+        for noun in nouns:
+            all_nouns.append(noun.decode('utf-8'))
+    forbidden_words = [word.title() for word in _forbidden_words]
+    return Counter([item for item in all_nouns if item not in forbidden_words])
+
+
+def measure(func, corpus, repeat=3):
+    """Get the best run time of a function over the corpus in seconds, and its result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.time()
+        result = func(corpus)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def main(no_of_paragraphs=20000):
+    corpus = make_corpus(no_of_paragraphs)
+    size_mb = sum(len(paragraph.encode('utf-8')) for paragraph in corpus) / 1024.0 / 1024.0
+    print 'Corpus: {0} paragraphs, {1:.1f} MB'.format(len(corpus), size_mb)
+
+    legacy_time, legacy_counts = measure(count_nouns_legacy, corpus)
+    new_time, new_counts = measure(count_nouns, corpus)
+
+    for name, elapsed in (('legacy', legacy_time), ('current', new_time)):
+        print '{0:8s} {1:8.3f} s {2:10.0f} paragraphs/s {3:6.2f} MB/s'.format(
+            name, elapsed, len(corpus) / elapsed, size_mb / elapsed)
+    print 'Speedup: {0:.1f}x'.format(legacy_time / new_time)
+    print 'Same result: {0}'.format(legacy_counts == new_counts)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Offline benchmark suite for the hot paths of the scraper, the solver and the web app.
+
+Runs without network and without MongoDB: pages are served from the HTML fixtures in benchmarks/fixtures (following
+the markup of Tagesschau.de and the lookup pages the extractors expect) and the web app reads from an in-memory store
+(see memstore.py). Each benchmark is called repeatedly for a minimum time, then its throughput and latency percentiles
+are reported and compared with a stored baseline. A benchmark whose median latency grew by more than the threshold
+counts as a regression, and the suite exits with status 1.
+
+Benchmarks:
+    tagesschau_words: scraper.get_tagesschau_words end to end on a front page with 12 articles.
+    parse_synonyms, parse_syllables: parsing of a synonym and a syllable lookup page, as in get_synonyms and
+        get_syllable.
+    stem: GermanStemmer2.stem on nouns of the lexicon.
+    lexicon: lookups of known and unknown words in the lexicon.
+    solver_<n>: the poem solver on a fixed candidate pool of n words, for increasing n.
+    flask_main, flask_archive: the routes of flaskapp.py through the Flask test client, skipped if Flask is not
+        installed.
+
+Usage:
+    python benchmarks/bench_suite.py [--only NAME ...] [--min-time SECONDS] [--threshold FACTOR] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from datetime import datetime, timedelta
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(benchmark_dir, '..')
+sys.path.insert(0, os.path.join(root_dir, 'scraper'))
+
+import fetcher
+
+from lexicon import load_lexicon
+from extractors import extract_article_urls
+from scraper import get_tagesschau_words
+from lookup import parse_synonyms, parse_syllables
+from GermanStemmer2 import GermanStemmer2
+from solver import CandidatePool, solve_poem
+from schemes import load_scheme, DEFAULT_SCHEME
+from poem_html import render_fragments
+from memstore import MemoryMongo
+
+FIXTURE_DIR = os.path.join(benchmark_dir, 'fixtures')
+
+DEFAULT_BASELINE_PATH = os.path.join(benchmark_dir, 'baseline.json')
+
+# factor by which the median latency of a benchmark must have grown to count as a regression
+DEFAULT_THRESHOLD = 1.3
+
+# minimum seconds and calls each benchmark runs
+DEFAULT_MIN_TIME = 1.0
+MIN_CALLS = 5
+
+# sizes of the candidate pools the solver is benchmarked on
+SOLVER_POOL_SIZES = [25, 50, 100, 200, 400]
+
+FRONT_PAGE_URL = 'http://www.tagesschau.de/'
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), 'rb') as fixture_file:
+        return fixture_file.read()
+
+
+class FixtureBackend(object):
+    """Fetcher backend serving fixtures instead of web pages, see fetcher.set_backend."""
+
+    def __init__(self, pages):
+        """
+        Args:
+            pages: A dictionary mapping URLs to page bodies.
+        """
+        self.pages = pages
+
+    def fetch(self, url, timeout, retries):
+        body = self.pages.get(url)
+        if body is None:
+            raise IOError('Page not in fixtures: ' + url)
+        return body
+
+
+def setup_tagesschau_words():
+    front_page = load_fixture('front_page.html')
+    articles = [load_fixture('article_{0}.html'.format(nx)) for nx in range(1, 4)]
+    pages = {FRONT_PAGE_URL: front_page}
+    for nx, url in enumerate(extract_article_urls(front_page)):
+        pages[url] = articles[nx % len(articles)]
+    fetcher.set_cache(None)
+    fetcher.set_backend(FixtureBackend(pages))
+    return lambda: get_tagesschau_words(30), 1
+
+
+def setup_parse_synonyms():
+    html = load_fixture('synonyms.html')
+    return lambda: parse_synonyms(html, u'Regierung'), 1
+
+
+def setup_parse_syllables():
+    html = load_fixture('syllables.html')
+    return lambda: parse_syllables(html, u'Regierung'), 1
+
+
+def get_lexicon_nouns(no_of_words, seed=0):
+    nouns = sorted(word for word in load_lexicon() if word.istitle())
+    return random.Random(seed).sample(nouns, no_of_words)
+
+
+def setup_stem():
+    words = [word.lower() for word in get_lexicon_nouns(1000)]
+    stemmer = GermanStemmer2()
+
+    def stem_words():
+        for word in words:
+            stemmer.stem(word)
+    return stem_words, len(words)
+
+
+def setup_lexicon():
+    lexicon = load_lexicon()
+    known = get_lexicon_nouns(5000)
+    words = known + [word + u'x' for word in known]
+
+    def look_up_words():
+        for word in words:
+            word in lexicon
+    return look_up_words, len(words)
+
+
+def make_pool(no_of_words, seed=0, no_of_rhymes=15):
+    """Make a reproducible candidate pool of words with random stress patterns and last syllables."""
+    rnd = random.Random(seed)
+    patterns = [[1], [1, 0], [0, 1], [1, 0, 0], [0, 1, 0], [1, 0, 0, 1], [0, 0, 1], [1, 0, 1]]
+    rhymes = [u'en{0}'.format(nx) for nx in range(no_of_rhymes)]
+    words = [u'w{0}'.format(nx) for nx in range(no_of_words)]
+    stresses = [rnd.choice(patterns) for _ in range(no_of_words)]
+    last_syls = [rnd.choice(rhymes) for _ in range(no_of_words)]
+    return CandidatePool(words, stresses, last_syls)
+
+
+def make_setup_solver(no_of_words):
+    def setup_solver():
+        pool = make_pool(no_of_words)
+        scheme = load_scheme(DEFAULT_SCHEME)
+        return lambda: solve_poem(pool, scheme.lines, scheme.rhyme_scheme, seed=1), 1
+    return setup_solver
+
+
+def _load_flaskapp():
+    """Import flaskapp.py with an in-memory store instead of MongoDB."""
+    import flask_pymongo
+
+    os.environ.setdefault('TAGESPOET_FLASK_CONFIG', 'flaskapp_dummy.cfg')
+    for name in ('HOST', 'PORT', 'USERNAME', 'PASSWORD'):
+        os.environ.setdefault('OPENSHIFT_MONGODB_DB_' + name, '')
+    flask_pymongo.PyMongo = MemoryMongo
+    sys.path.insert(0, root_dir)
+    import flaskapp
+
+    flaskapp.app.config['TESTING'] = True
+    poems = flaskapp.mongo.db.poems
+    if not poems.docs:
+        first_date = datetime(2015, 1, 1, 6)
+        keywords = [u'Regierung', u'Haushalt', u'Bundestag', u'Klimagipfel', u'Inflation']
+        poem = [[u'Regierung', u'Haushalt', u'Bundestag'], [u'Kabinett', u'Parlament'],
+                [u'Gipfel', u'Verhandlung', u'Klima'], [u'Preise', u'Inflation']]
+        for day in range(365):
+            poems.insert({'date': first_date + timedelta(days=day), 'keywords': keywords, 'poem': poem,
+                          'html': render_fragments(poem, keywords)})
+    return flaskapp
+
+
+def make_setup_flask(url):
+    def setup_flask():
+        client = _load_flaskapp().app.test_client()
+        status_code = client.get(url).status_code
+        if status_code != 200:
+            raise RuntimeError('Status {0} for {1}'.format(status_code, url))
+        return lambda: client.get(url), 1
+    return setup_flask
+
+
+BENCHMARKS = [
+    ('tagesschau_words', setup_tagesschau_words),
+    ('parse_synonyms', setup_parse_synonyms),
+    ('parse_syllables', setup_parse_syllables),
+    ('stem', setup_stem),
+    ('lexicon', setup_lexicon),
+] + [('solver_{0}'.format(size), make_setup_solver(size)) for size in SOLVER_POOL_SIZES] + [
+    ('flask_main', make_setup_flask('/')),
+    ('flask_archive', make_setup_flask('/_get_archived_poem?date=2015-06-01')),
+]
+
+
+def percentile(sorted_values, fraction):
+    """Get a percentile of sorted values, interpolating between the nearest values."""
+    pos = (len(sorted_values) - 1) * fraction
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def run_benchmark(func, items_per_call, min_time=DEFAULT_MIN_TIME, min_calls=MIN_CALLS):
+    """Call a function repeatedly and measure its latencies.
+
+    Args:
+        func: The function, called without arguments.
+        items_per_call: No. of items (e.g. words) processed by each call, for the throughput.
+        min_time: Minimum no. of seconds to call the function for.
+        min_calls: Minimum no. of calls.
+
+    Returns:
+        A dictionary with the no. of calls, the throughput in items per second and the 50th, 90th and 99th
+        percentile of the latencies in milliseconds.
+    """
+    # warm up caches, e.g. the lexicon and compiled patterns
+    func()
+    latencies = []
+    start_time = time.time()
+    while len(latencies) < min_calls or time.time() - start_time < min_time:
+        call_start_time = time.time()
+        func()
+        latencies.append(time.time() - call_start_time)
+    latencies.sort()
+    return {'calls': len(latencies),
+            'throughput': items_per_call * len(latencies) / sum(latencies),
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p90': percentile(latencies, 0.9) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000}
+
+
+def compare_with_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare the median latencies of benchmarks with a baseline.
+
+    Args:
+        results: A dictionary mapping benchmark names to results, see run_benchmark.
+        baseline: A dictionary of results of an earlier run.
+        threshold: Factor by which the median latency must have grown to count as a regression.
+
+    Returns:
+        A dictionary mapping the name of each benchmark in both results and baseline to the ratio of its median
+        latency to the baseline, and a list of the names of regressed benchmarks.
+    """
+    ratios = {}
+    regressions = []
+    for name, result in results.iteritems():
+        if name in baseline and baseline[name]['p50'] > 0:
+            ratios[name] = result['p50'] / baseline[name]['p50']
+            if ratios[name] > threshold:
+                regressions.append(name)
+    return ratios, sorted(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the offline benchmark suite.')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='run only these benchmarks')
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME, help='minimum seconds per benchmark')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help='path of the baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='factor by which the median latency must grow to count as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'rb') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    print '{0:<18} {1:>7} {2:>12} {3:>10} {4:>10} {5:>10} {6:>9}'.format(
+        'benchmark', 'calls', 'items/s', 'p50 ms', 'p90 ms', 'p99 ms', 'baseline')
+    for name, setup in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        try:
+            func, items_per_call = setup()
+        except ImportError as e:
+            print '{0:<18} skipped: {1}'.format(name, e)
+            continue
+        results[name] = result = run_benchmark(func, items_per_call, args.min_time)
+        ratio = result['p50'] / baseline[name]['p50'] if name in baseline and baseline[name]['p50'] > 0 else None
+        print '{0:<18} {1:>7} {2:>12.1f} {3:>10.3f} {4:>10.3f} {5:>10.3f} {6:>9}'.format(
+            name, result['calls'], result['throughput'], result['p50'], result['p90'], result['p99'],
+            '{0:.2f}x'.format(ratio) if ratio is not None else '-')
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'wb') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True, separators=(',', ': '))
+        print 'Baseline saved to ' + args.baseline
+        return
+
+    _, regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print '+++ Slower than baseline by more than {0:.2f}x: {1} +++'.format(args.threshold, ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
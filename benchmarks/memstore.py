@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""In-memory stand-in for the parts of a pymongo database used by the scraper and the web app.
+
+Supports find, find_one, insert, update, remove and find_and_modify with equality queries and the operators $in, $gt,
+$gte, $lt, $lte, $ne and $exists, sorting and limits. Documents are kept in a list, so queries scan all documents,
+which is fine for the small collections of the benchmarks.
+"""
+
+import copy
+
+from bson.objectid import ObjectId
+
+_comparisons = {
+    '$gt': lambda value, arg: value is not None and value > arg,
+    '$gte': lambda value, arg: value is not None and value >= arg,
+    '$lt': lambda value, arg: value is not None and value < arg,
+    '$lte': lambda value, arg: value is not None and value <= arg,
+    '$ne': lambda value, arg: value != arg,
+    # like MongoDB, match arrays containing any of the values
+    '$in': lambda value, arg: any(item in arg for item in value) if isinstance(value, list) else value in arg,
+}
+
+
+def _matches(doc, query):
+    for field, condition in query.iteritems():
+        value = doc.get(field)
+        if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+            for operator, arg in condition.iteritems():
+                if operator == '$exists':
+                    if (field in doc) != bool(arg):
+                        return False
+                elif not _comparisons[operator](value, arg):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    fields = [field for field, include in projection.iteritems() if include and field != '_id']
+    result = dict((field, copy.deepcopy(doc[field])) for field in fields if field in doc)
+    if projection.get('_id', 1):
+        result['_id'] = doc['_id']
+    return result
+
+
+class MemoryCursor(list):
+    """Result of a query, supporting the chained calls of a pymongo cursor."""
+
+    def sort(self, key_or_list, direction=None):
+        keys = [(key_or_list, direction or 1)] if isinstance(key_or_list, basestring) else key_or_list
+        # sort by the last key first, so earlier keys take precedence
+        for field, field_direction in reversed(keys):
+            list.sort(self, key=lambda doc: doc.get(field), reverse=field_direction < 0)
+        return self
+
+    def limit(self, no_of_docs):
+        if no_of_docs:
+            del self[no_of_docs:]
+        return self
+
+    def count(self, *args):
+        return len(self)
+
+
+class MemoryCollection(object):
+    """A collection of documents."""
+
+    def __init__(self):
+        self.docs = []
+
+    def find(self, spec=None, fields=None, sort=None, limit=0):
+        cursor = MemoryCursor(doc for doc in self.docs if _matches(doc, spec or {}))
+        if sort:
+            cursor.sort(sort)
+        cursor.limit(limit)
+        return MemoryCursor(_project(doc, fields) for doc in cursor)
+
+    def find_one(self, spec=None, fields=None, sort=None):
+        docs = self.find(spec, fields, sort, limit=1)
+        return docs[0] if docs else None
+
+    def insert(self, doc_or_docs):
+        docs = [doc_or_docs] if isinstance(doc_or_docs, dict) else doc_or_docs
+        for doc in docs:
+            doc.setdefault('_id', ObjectId())
+            self.docs.append(copy.deepcopy(doc))
+        return docs[0]['_id'] if isinstance(doc_or_docs, dict) else [doc['_id'] for doc in docs]
+
+    def update(self, spec, document, upsert=False, multi=False):
+        updated = 0
+        for doc in self.docs:
+            if _matches(doc, spec):
+                doc.update(copy.deepcopy(document['$set']))
+                updated += 1
+                if not multi:
+                    break
+        if not updated and upsert:
+            doc = dict((field, value) for field, value in spec.iteritems() if not isinstance(value, dict))
+            doc.update(document['$set'])
+            self.insert(doc)
+        return {'n': updated}
+
+    def remove(self, spec=None):
+        self.docs = [doc for doc in self.docs if not _matches(doc, spec or {})]
+
+    def find_and_modify(self, query, update, sort=None, new=False):
+        matching = MemoryCursor(doc for doc in self.docs if _matches(doc, query))
+        if sort:
+            matching.sort(sort)
+        if not matching:
+            return None
+        doc = matching[0]
+        old = copy.deepcopy(doc)
+        doc.update(copy.deepcopy(update['$set']))
+        return copy.deepcopy(doc) if new else old
+
+    def ensure_index(self, *args, **kwargs):
+        pass
+
+    create_index = ensure_index
+
+
+class MemoryDatabase(object):
+    """A database creating collections on first access, like pymongo."""
+
+    def __init__(self):
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection()
+        return self._collections[name]
+
+
+class MemoryMongo(object):
+    """Stand-in for flask_pymongo.PyMongo, serving an in-memory database."""
+
+    def __init__(self, app=None, config_prefix='MONGO'):
+        self.db = MemoryDatabase()
@@ -16,21 +16,40 @@ The application is meant to run on OpenShift [openshift]. It is configured to se
 """
 
 from __future__ import print_function  # In python 2.7
+from collections import OrderedDict
 from datetime import timedelta, datetime
+import hashlib
+import os
 import sys
-from flask import Flask, request, render_template, jsonify
+import threading
+import time
+from flask import Flask, request, render_template, escape, json
 from flask_mail import Message, Mail
-from flask_wtf.csrf import CsrfProtect
+from flask_wtf.csrf import CsrfProtect, generate_csrf
 import flask_pymongo
 from flask_pymongo import PyMongo
 from flask_debugtoolbar import DebugToolbarExtension
 from forms import ContactForm
 from dateutil import parser as dateparser
 
+# the HTML fragments of poems are shared with the scraper, which stores them with each poem
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scraper'))
+from poem_html import get_fragments
 
-# app config
+
+# app config, TAGESPOET_FLASK_CONFIG selects another config file, e.g. flaskapp_dummy.cfg for the benchmarks
 app = Flask(__name__)
-app.config.from_pyfile('flaskapp.cfg')
+app.config.from_pyfile(os.environ.get('TAGESPOET_FLASK_CONFIG', 'flaskapp.cfg'))
+
+# seconds the main page is cached at most, and between checks for a new poem
+app.config.setdefault('MAIN_PAGE_TTL', 3600)
+app.config.setdefault('MAIN_PAGE_CHECK_INTERVAL', 30)
+
+# seconds browsers may cache archived poems of past days and of today (or missing poems), and no. of archived poems
+# cached in process
+app.config.setdefault('ARCHIVE_MAX_AGE', 365 * 24 * 3600)
+app.config.setdefault('ARCHIVE_TODAY_MAX_AGE', 300)
+app.config.setdefault('ARCHIVE_CACHE_SIZE', 512)
 
 # debug config
 app.debug = False
@@ -43,55 +62,126 @@ mail = Mail()
 mail.init_app(app)
 
 
-def make_poem_html(poem, pid):
-    """This function makes a section of HTML code for a poem.
+# stands for the CSRF token in cached renderings of the main page, replaced by the token of each request
+CSRF_PLACEHOLDER = '__csrf_token_placeholder__'
 
-    Args:
-        poem: A poem defined as a list (rows) of lists (words in rows).
-        pid: HTML <p> tag ID attribute for CSS identification.
 
-    Returns:
-        A string containing HTML code for displaying a poem, for example:
+class MainPageCache(object):
+    """In-process cache of the poem data and the rendering of the main page.
 
-        '<p id="poemline">Day, Morning, Sun,</p><p id="poemline">Birds, Trees, Grass.</p>'
+    The _id of the newest poem serves as generation: the cache is refreshed when a new poem was stored, checking for
+    it at most every check_interval seconds, so that requests in between are served without touching the database.
+    The cache is also refreshed when the day changes, as the archive shows the poem up to yesterday, and after the TTL.
     """
-    res_html = ''
-    for line in poem[:-1]:
-        res_html += '<p id="' + pid + '">'
-        for word in line:
-            res_html += word + ', '
-        res_html += '</p>'
-    res_html += '<p id="' + pid + '">'
-    for word in poem[-1][:-1]:
-        res_html += word + ', '
-    res_html += poem[-1][-1] + '.</p>'
-    return res_html
-
-
-def make_keyword_html(keywords):
-    """This function makes a section of HTML code for a list of keywords.
 
-    Args:
-        keywords: A list of strings where each string is a keyword.
+    def __init__(self, ttl, check_interval):
+        """
+        Args:
+            ttl: Seconds the data is cached at most.
+            check_interval: Seconds between checks for a new poem.
+        """
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.data = None
+        self.page = None
+        self._day = None
+        self._generation = None
+        self._load_time = 0
+        self._check_time = 0
+        # requests arriving while the data is loaded wait for it instead of querying the database as well
+        self._lock = threading.Lock()
+
+    def get(self, day, get_generation, load_data):
+        """Get the cached data, loading it if needed.
+
+        Args:
+            day: The current day. Data cached on another day is loaded again.
+            get_generation: A function returning the current generation, i.e. the _id of the newest poem.
+            load_data: A function returning the data.
+
+        Returns:
+            A tuple of the data and the cached rendering of the main page for the data, or None if there is none.
+        """
+        with self._lock:
+            now = time.time()
+            if self.data is not None and self._day == day and now - self._load_time < self.ttl:
+                if now - self._check_time < self.check_interval:
+                    return self.data, self.page
+                self._check_time = now
+                generation = get_generation()
+                if generation == self._generation:
+                    return self.data, self.page
+            else:
+                generation = get_generation()
+            self.data = load_data()
+            self.page = None
+            self._day = day
+            self._generation = generation
+            self._load_time = self._check_time = now
+            return self.data, self.page
+
+    def set_page(self, data, page):
+        """Cache the rendering of the main page, unless the data it was rendered from is outdated already."""
+        with self._lock:
+            if data is self.data:
+                self.page = page
+
+
+main_page_cache = MainPageCache(app.config['MAIN_PAGE_TTL'], app.config['MAIN_PAGE_CHECK_INTERVAL'])
+
+
+def get_newest_poem_id():
+    """Get the _id of the newest poem, or None if there is no poem."""
+    newest_poem = mongo.db.poems.find_one({}, {'_id': 1}, sort=[('date', flask_pymongo.DESCENDING)])
+    return newest_poem['_id'] if newest_poem is not None else None
+
+
+def get_main_page_data():
+    """Get the poem data for both current and archive display on the main page from the database.
 
     Returns:
-        A string containing HTML code for displaying keywords, for example:
-
-        '<strong>Ausgangsw&ouml;rter:</strong> Nature, Plants, Fauna'
+        A dictionary of template variables.
     """
-    res_html = '<strong>Ausgangsw&ouml;rter:</strong> '
-    for word in keywords[:-1]:
-        res_html += word + ', '
-    res_html += keywords[-1]
-    return res_html
+
+    # get poem of the day
+    cur_poem = mongo.db.poems.find_one({}, sort=[('date', flask_pymongo.DESCENDING)])
+    if cur_poem is not None:
+        # poem found, served with the HTML stored at generation time
+        cur_poem_ret = get_fragments(cur_poem)['poem']
+        cur_poem_render_ret = 1
+    else:
+        # no poem found, return empty values
+        # TODO: Implement error handling (logging, sending out maintenance request email)
+        cur_poem_ret = ''
+        cur_poem_render_ret = 0
+
+    # organize archive
+    first_poem = mongo.db.poems.find_one({}, sort=[('date', flask_pymongo.ASCENDING)])
+
+    now = datetime.now()
+    yesterdays_date = datetime(now.year, now.month, now.day, 0, 0, 1) + timedelta(hours=6) - timedelta(days=1)
+    last_poem = mongo.db.poems.find_one({'date': {'$lte': yesterdays_date}}, sort=[('date', flask_pymongo.DESCENDING)])
+
+    last_poem_html = get_fragments(last_poem)
+    todays_date = datetime.today() + timedelta(hours=6)
+
+    return dict(todays_date=todays_date.strftime("%d.%m.%YYYY"),
+                cur_poem_render=cur_poem_render_ret,
+                cur_poem=cur_poem_ret,
+                first_poem_date=first_poem['date'].strftime('%d.%m.%Y'),
+                last_poem_date=last_poem['date'].strftime('%d.%m.%Y'),
+                last_poem_date_heading=last_poem['date'].strftime("%Y-%m-%dT%H:%M:%S"),
+                last_poem=last_poem_html['archive_poem'],
+                last_keywords=last_poem_html['keywords'])
 
 
 @app.route("/", methods=['GET', 'POST'])
 def mainsite():
     """This function renders the main website.
 
-    The function evaluates the contact form and gets poem data for both current and archive display from a database
-    when loading the site.
+    The function evaluates the contact form and gets poem data for both current and archive display from the main page
+    cache. The rendering of the page without form data is cached as well, with a placeholder for the CSRF token that
+    is replaced by the token of each request.
     """
 
     # define standard display
@@ -115,38 +205,74 @@ def mainsite():
             contact_form_success = True
             jump_to_contact = True
 
-    # get poem of the day
-    cur_poem = mongo.db.poems.find_one({}, sort=[('date', flask_pymongo.DESCENDING)])
-    if cur_poem is not None:
-        # poem found
-        cur_poem_ret = make_poem_html(cur_poem['poem'], 'poemline')
-        cur_poem_render_ret = 1
-    else:
-        # no poem found, return empty values
-        # TODO: Implement error handling (logging, sending out maintenance request email)
-        cur_poem_ret = ''
-        cur_poem_render_ret = 0
+    # the archive shows the poem up to yesterday and the heading today's date (both German time)
+    now = datetime.now()
+    day = (now.date(), (now + timedelta(hours=6)).date())
+    data, page = main_page_cache.get(day, get_newest_poem_id, get_main_page_data)
 
-    # organize archive
-    first_poem = mongo.db.poems.find_one({}, sort=[('date', flask_pymongo.ASCENDING)])
+    if request.method == 'GET':
+        if page is None:
+            page = render_template('index.htm', contact_form=contact_form, contact_form_success=False,
+                                   jump_to_contact=False, csrf_token=lambda: CSRF_PLACEHOLDER, **data)
+            main_page_cache.set_page(data, page)
+        return page.replace(CSRF_PLACEHOLDER, unicode(escape(generate_csrf())))
 
-    now = datetime.now()
-    yesterdays_date = datetime(now.year, now.month, now.day, 0, 0, 1) + timedelta(hours=6) - timedelta(days=1)
-    last_poem = mongo.db.poems.find_one({'date': {'$lte': yesterdays_date}}, sort=[('date', flask_pymongo.DESCENDING)])
+    return render_template('index.htm', contact_form=contact_form, contact_form_success=contact_form_success,
+                           jump_to_contact=jump_to_contact, **data)
 
-    todays_date = datetime.today() + timedelta(hours=6)
 
-    return render_template('index.htm', todays_date=todays_date.strftime("%d.%m.%YYYY"),
-                           cur_poem_render=cur_poem_render_ret,
-                           cur_poem=cur_poem_ret,
-                           first_poem_date=first_poem['date'].strftime('%d.%m.%Y'),
-                           last_poem_date=last_poem['date'].strftime('%d.%m.%Y'),
-                           last_poem_date_heading=last_poem['date'].strftime("%Y-%m-%dT%H:%M:%S"),
-                           last_poem=make_poem_html(last_poem['poem'], 'poemarchiveline'),
-                           last_keywords=make_keyword_html(last_poem['keywords']),
-                           contact_form=contact_form,
-                           contact_form_success=contact_form_success,
-                           jump_to_contact=jump_to_contact)
+class ArchiveCache(object):
+    """In-process LRU cache of the responses of get_archived_poem, keyed by date.
+
+    Responses with poems of past days never change and are kept until they are evicted. Responses for today (or later
+    days) and responses without a poem expire, as the poem may not be stored yet.
+    """
+
+    def __init__(self, max_size):
+        """
+        Args:
+            max_size: Maximum no. of responses kept.
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, date):
+        """Get the cached response for a date.
+
+        Returns:
+            A tuple of body, ETag and Cache-Control header, or None if no response for the date is cached or it
+            expired.
+        """
+        with self._lock:
+            entry = self._entries.pop(date, None)
+            if entry is None:
+                return None
+            body, etag, cache_control, expires = entry
+            if expires is not None and time.time() >= expires:
+                return None
+            # mark as most recently used
+            self._entries[date] = entry
+            return body, etag, cache_control
+
+    def put(self, date, body, etag, cache_control, max_age=None):
+        """Cache the response for a date.
+
+        Args:
+            date: The date.
+            body: The body of the response.
+            etag: The ETag of the body.
+            cache_control: The Cache-Control header of the response.
+            max_age: Seconds after which the response expires, or None if it never does.
+        """
+        with self._lock:
+            self._entries.pop(date, None)
+            self._entries[date] = body, etag, cache_control, time.time() + max_age if max_age is not None else None
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+archive_cache = ArchiveCache(app.config['ARCHIVE_CACHE_SIZE'])
 
 
 @app.route('/_get_archived_poem')
@@ -154,21 +280,59 @@ def get_archived_poem():
     """This function gets an archived poem.
 
     This function is called by the main website whenever a day in the calendar is clicked on.
+
+    As poems of past days never change, their responses are cached in process and may be cached by browsers and proxies
+    for a long time. Responses for today, and responses without a poem (which may still be added, e.g. by a manual run),
+    are cached for a short time only. Responses carry a strong ETag, so that a request with a matching If-None-Match
+    header is answered with 304 Not Modified.
     """
 
     # parse input
     qry_date = request.args.get('date', 0, type=str)
     qry_date_formatted = dateparser.parse(qry_date)
-    qry_date_start = datetime(qry_date_formatted.year, qry_date_formatted.month, qry_date_formatted.day, 0, 0, 1)
-    qry_date_end = datetime(qry_date_formatted.year, qry_date_formatted.month, qry_date_formatted.day, 23, 59, 59)
+    qry_day = qry_date_formatted.date()
+
+    cached = archive_cache.get(qry_day)
+    if cached is None:
+        body, poem_found = make_archived_poem_json(qry_day)
+        etag = hashlib.sha1(body).hexdigest()
+        # poems of days before today (German time) are final, while a missing poem may still be added
+        if poem_found and qry_day < (datetime.now() + timedelta(hours=6)).date():
+            cache_control = 'public, max-age={0}, immutable'.format(app.config['ARCHIVE_MAX_AGE'])
+            archive_cache.put(qry_day, body, etag, cache_control)
+        else:
+            max_age = app.config['ARCHIVE_TODAY_MAX_AGE']
+            cache_control = 'public, max-age={0}'.format(max_age)
+            archive_cache.put(qry_day, body, etag, cache_control, max_age)
+    else:
+        body, etag, cache_control = cached
+
+    response = app.response_class(body, mimetype='application/json')
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def make_archived_poem_json(qry_day):
+    """This function makes the JSON response with an archived poem.
+
+    Args:
+        qry_day: The date of the poem.
+
+    Returns:
+        A tuple of a string containing the JSON response and whether a poem was found.
+    """
+    qry_date_start = datetime(qry_day.year, qry_day.month, qry_day.day, 0, 0, 1)
+    qry_date_end = datetime(qry_day.year, qry_day.month, qry_day.day, 23, 59, 59)
 
     # get poem
     qry_poem = mongo.db.poems.find_one({'date': {'$gte': qry_date_start, '$lt': qry_date_end}})
     if qry_poem is not None:
-        # poem found
+        # poem found, served with the HTML stored at generation time
         qry_poem_render_ret = 1
-        qry_poem_ret = make_poem_html(qry_poem['poem'], 'poemarchiveline')
-        qry_words_ret = make_keyword_html(qry_poem['keywords'])
+        qry_poem_html = get_fragments(qry_poem)
+        qry_poem_ret = qry_poem_html['archive_poem']
+        qry_words_ret = qry_poem_html['keywords']
     else:
         # no poem found, return error message
         # TODO: Deactivate days on calendar for which no poem is available.
@@ -176,10 +340,11 @@ def get_archived_poem():
         qry_poem_ret = 'Es ist kein Gedicht für dieses Datum verfügbar.'
         qry_words_ret = ''
 
-    return jsonify(timestamp=qry_date_start.strftime("%Y-%m-%dT%H:%M:%S"),
-                   keywords=qry_words_ret,
-                   poem=qry_poem_ret,
-                   poem_render=qry_poem_render_ret)
+    # same JSON for every request and process, so the ETag of a poem does not change
+    return json.dumps(dict(timestamp=qry_date_start.strftime("%Y-%m-%dT%H:%M:%S"),
+                           keywords=qry_words_ret,
+                           poem=qry_poem_ret,
+                           poem_render=qry_poem_render_ret), sort_keys=True), qry_poem is not None
 
 if __name__ == "__main__":
     app.run()
@@ -1,3 +1,7 @@
+import cPickle as pickle
+import os
+
+from collections import OrderedDict
 from nltk.stem.snowball import _StandardStemmer
 
 
@@ -6,7 +10,11 @@ class GermanStemmer2(_StandardStemmer):
     """
     The German Snowball stemmer.
     This stemmer has been modified to not replace umlauts at the end of stemming (see code).
+    It also keeps a bounded cache of stemmed words for stem_many, which can be saved to and loaded from a file so that
+    it carries over between runs.
 
+    :ivar cache_size: The maximum number of words kept in the cache.
+    :type cache_size: int
     :cvar __vowels: The German vowels.
     :type __vowels: unicode
     :cvar __s_ending: Letters that may directly appear before a word final 's'.
@@ -25,53 +33,132 @@ class GermanStemmer2(_StandardStemmer):
 
     """
 
-    __vowels = "aeiouy\xE4\xF6\xFC"
-    __s_ending = "bdfghklmnrt"
-    __st_ending = "bdfghklmnt"
+    __vowels = frozenset(u"aeiouy\xE4\xF6\xFC")
+    __s_ending = u"bdfghklmnrt"
+    __st_ending = u"bdfghklmnt"
+
+    __step1_suffixes = (u"ern", u"em", u"er", u"en", u"es", u"e", u"s")
+    __step2_suffixes = (u"est", u"en", u"er", u"st")
+    __step3_suffixes = (u"isch", u"lich", u"heit", u"keit",
+                          u"end", u"ung", u"ig", u"ik")
+
+    def __init__(self, ignore_stopwords=False, cache_size=100000):
+        _StandardStemmer.__init__(self, ignore_stopwords)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def stem_many(self, words):
+        """
+        Stem several German words, using the cache for words stemmed before.
+        When the cache is full, the least recently used words are dropped.
+
+        :param words: The words that are stemmed.
+        :type words: list of unicode
+        :return: The stemmed forms, in the same order as words.
+        :rtype: list of unicode
 
-    __step1_suffixes = ("ern", "em", "er", "en", "es", "e", "s")
-    __step2_suffixes = ("est", "en", "er", "st")
-    __step3_suffixes = ("isch", "lich", "heit", "keit",
-                          "end", "ung", "ig", "ik")
+        """
+        cache = self._cache
+        stems = []
+        for word in words:
+            stem = cache.pop(word, None)
+            if stem is None:
+                stem = self.stem(word)
+            # (re)insert as the most recently used word
+            cache[word] = stem
+            stems.append(stem)
+        # drop the least recently used words
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return stems
+
+    def load_table(self, path):
+        """
+        Load cached stems from a file written by save_table.
+        A missing or unreadable file leaves the cache unchanged.
+
+        :param path: The path of the file.
+        :type path: str
+
+        """
+        try:
+            with open(path, 'rb') as table_file:
+                table = pickle.load(table_file)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return
+        for word, stem in table:
+            self._cache[word] = stem
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def save_table(self, path):
+        """
+        Save the cached stems to a file, from the least to the most recently used.
+        The file is replaced at once, so a reader never sees it half written.
+
+        :param path: The path of the file.
+        :type path: str
+
+        """
+        tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as table_file:
+            pickle.dump(self._cache.items(), table_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, path)
 
     def stem(self, word):
         """
         Stem a German word and return the stemmed form.
 
-        :param word: The word that is stemmed.
+        :param word: The word that is stemmed. A str is expected to be
+                     encoded in ISO-8859-1.
         :type word: str or unicode
-        :return: The stemmed form.
-        :rtype: unicode
+        :return: The stemmed form, of the same type as word.
+        :rtype: str or unicode
 
         """
+        if isinstance(word, str):
+            return self.stem(word.decode('iso-8859-1')).encode('iso-8859-1')
+
         word = word.lower()
 
         if word in self.stopwords:
             return word
 
-        word = word.replace("\xDF", "ss")
+        word = word.replace(u"\xDF", u"ss")
+        vowels = self.__vowels
 
         # Every occurrence of 'u' and 'y'
         # between vowels is put into upper case.
-        for i in range(1, len(word)-1):
-            if word[i-1] in self.__vowels and word[i+1] in self.__vowels:
-                if word[i] == "u":
-                    word = "".join((word[:i], "U", word[i+1:]))
-
-                elif word[i] == "y":
-                    word = "".join((word[:i], "Y", word[i+1:]))
-
-        r1, r2 = self._r1r2_standard(word, self.__vowels)
+        if u"u" in word or u"y" in word:
+            chars = list(word)
+            for i in range(1, len(chars)-1):
+                if chars[i-1] in vowels and chars[i+1] in vowels:
+                    if chars[i] == u"u":
+                        chars[i] = u"U"
+
+                    elif chars[i] == u"y":
+                        chars[i] = u"Y"
+            word = u"".join(chars)
+
+        # R1 is the region after the first non-vowel following a vowel,
+        # R2 the region after the first non-vowel following a vowel in R1.
+        r1 = u""
+        r2 = u""
+        r1_start = 0
+        for i in range(1, len(word)):
+            if word[i] not in vowels and word[i-1] in vowels:
+                r1_start = i+1
+                r1 = word[r1_start:]
+                break
+        for i in range(1, len(r1)):
+            if r1[i] not in vowels and r1[i-1] in vowels:
+                r2 = r1[i+1:]
+                break
 
         # R1 is adjusted so that the region before it
         # contains at least 3 letters.
-        for i in range(1, len(word)):
-            if word[i] not in self.__vowels and word[i-1] in self.__vowels:
-                if len(word[:i+1]) < 3 and len(word[:i+1]) > 0:
-                    r1 = word[3:]
-                elif len(word[:i+1]) == 0:
-                    return word
-                break
+        if 0 < r1_start < 3:
+            r1 = word[3:]
 
         # STEP 1
         for suffix in self.__step1_suffixes:
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing an archive of web pages for recording and replaying scraper runs.
+
+An archive consists of two files: a data file with the zlib-compressed bodies of all pages, one after another, and an
+index file with one line per page, consisting of the URL, the offset and the length of the page in the data file,
+separated by tabs. Both files are only appended to, so an interrupted recording leaves a usable archive. If a URL is
+recorded more than once, the last recording is used.
+"""
+
+import os
+import threading
+import zlib
+
+INDEX_SUFFIX = '.idx'
+
+
+class ResponseArchive(object):
+    """An archive of web pages, keyed by URL.
+
+    The archive can be shared by several threads.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Path of the data file. The index file is stored next to it, with the suffix '.idx'. Both are
+                created when the first page is added.
+        """
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self._index = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as index_file:
+                for line in index_file:
+                    url, offset, length = line.rstrip('\n').rsplit('\t', 2)
+                    self._index[url] = (int(offset), int(length))
+
+    def __contains__(self, url):
+        return self._key(url) in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    @staticmethod
+    def _key(url):
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        return url
+
+    def urls(self):
+        """Get the URLs of all pages in the archive."""
+        return self._index.keys()
+
+    def get(self, url):
+        """Get a page from the archive.
+
+        Args:
+            url: Absolute URL of the page.
+
+        Returns:
+            A string containing the body of the page, or None if the page is not in the archive.
+        """
+        location = self._index.get(self._key(url))
+        if location is None:
+            return None
+        offset, length = location
+        with open(self.path, 'rb') as data_file:
+            data_file.seek(offset)
+            return zlib.decompress(data_file.read(length))
+
+    def add(self, url, body):
+        """Add a page to the archive.
+
+        Args:
+            url: Absolute URL of the page. URLs must not contain tabs or line breaks.
+            body: A string containing the body of the page.
+        """
+        key = self._key(url)
+        data = zlib.compress(body)
+        with self._lock:
+            with open(self.path, 'ab') as data_file:
+                data_file.seek(0, os.SEEK_END)
+                offset = data_file.tell()
+                data_file.write(data)
+            with open(self.index_path, 'ab') as index_file:
+                index_file.write('{0}\t{1}\t{2}\n'.format(key, offset, len(data)))
+            self._index[key] = (offset, len(data))
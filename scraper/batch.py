@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing functions for generating several candidate poems in parallel and picking the best one.
+
+Each candidate poem is solved with its own seed in a pool of worker processes. As the solver is deterministic for a
+given seed, a candidate can be reproduced later by solving the same candidate pool with its seed.
+"""
+
+import random
+
+from multiprocessing import Pool, cpu_count
+
+from solver import run_solver
+from scoring import default_score
+
+# candidate pool and schemes of the current worker process, see _init_worker
+_worker_args = None
+
+
+def _init_worker(pool, poem_scheme, rhyme_scheme, budget):
+    global _worker_args
+    _worker_args = pool, poem_scheme, rhyme_scheme, budget
+
+
+def _solve_seed(seed):
+    pool, poem_scheme, rhyme_scheme, budget = _worker_args
+    return run_solver(pool, poem_scheme, rhyme_scheme, seed, budget)
+
+
+def make_seeds(no_of_poems, base_seed=None):
+    """Make seeds for candidate poems.
+
+    Args:
+        no_of_poems: No. of seeds.
+        base_seed: Seed of the first poem, the others follow consecutively. If None, a random one is picked.
+
+    Returns:
+        A list of ints.
+    """
+    if base_seed is None:
+        base_seed = random.SystemRandom().randrange(2 ** 31)
+    return range(base_seed, base_seed + no_of_poems)
+
+
+def generate_poems(pool, poem_scheme, rhyme_scheme, seeds, processes=None, score=default_score, budget=None):
+    """Solve a poem for each seed in parallel and score the complete poems.
+
+    Args:
+        pool: A solver.CandidatePool.
+        poem_scheme: A list of lines, each being a list of stresses.
+        rhyme_scheme: A list with the rhyme group (an int) of each line.
+        seeds: A list of seeds, see make_seeds.
+        processes: No. of worker processes, by default the no. of CPUs. With 1, poems are solved one after another in
+            the calling process.
+        score: A score function, see scoring.py.
+        budget: An optional solver.SolverBudget limiting the search for each poem.
+
+    Returns:
+        A list of tuples of score, seed and solver.SolverResult for each seed. Complete poems come first, best first,
+        followed by incomplete ones (with a score of None), most lines first.
+    """
+    if processes is None:
+        processes = cpu_count()
+    processes = min(processes, len(seeds))
+    if processes <= 1:
+        results = [run_solver(pool, poem_scheme, rhyme_scheme, seed, budget) for seed in seeds]
+    else:
+        workers = Pool(processes, _init_worker, (pool, poem_scheme, rhyme_scheme, budget))
+        try:
+            results = workers.map(_solve_seed, seeds)
+        finally:
+            workers.close()
+            workers.join()
+
+    complete = [(score(pool, result.lines), seed, result) for seed, result in zip(seeds, results) if result.complete]
+    complete.sort(key=lambda candidate: candidate[0], reverse=True)
+    incomplete = [(None, seed, result) for seed, result in zip(seeds, results) if not result.complete]
+    incomplete.sort(key=lambda candidate: len(candidate[2].lines), reverse=True)
+    return complete + incomplete
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing functions for extracting content from the web pages used by the scraper.
+
+Each function only builds a parse tree of the elements it needs (using a SoupStrainer), instead of building a tree of
+the whole page. This keeps parse time and memory low for the many article and lookup pages parsed per run.
+"""
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# elements needed from each page type
+_front_page_links = SoupStrainer('a', attrs={'class': None})
+_article_paragraph_divs = SoupStrainer('div', attrs={'class': 'mod modA modParagraph'})
+_synonym_headings = SoupStrainer('h4', attrs={'class': 'synonymsContent'})
+_syllable_divs = SoupStrainer('div', attrs={'class': 'rom first'})
+
+
+def extract_article_urls(html, base_url='http://www.tagesschau.de'):
+    """Get the URLs of the main articles on the front page of Tagesschau.de
+
+    Main articles are links without a class that contain a roof line, a headline and a teaser text.
+
+    Args:
+        html: A string containing the front page.
+        base_url: URL that relative links are resolved against.
+
+    Returns:
+        A list of absolute article URLs, in the order they appear on the page.
+    """
+    article_urls = []
+    site_text = BeautifulSoup(html, "html.parser", parse_only=_front_page_links)
+    for links in site_text.find_all('a', attrs={'class': None}):
+        dachzeilen = len(links.find_all('p', attrs={'class': 'dachzeile'}))
+        headlines = len(links.find_all('h4', attrs={'class': 'headline'}))
+        teasertexts = len(links.find_all('p', attrs={'class': 'teasertext'}))
+        if dachzeilen and headlines and teasertexts:
+            link_target = links['href']
+            if link_target[0] == '/':
+                article_urls.append(base_url + link_target)
+    return article_urls
+
+
+def extract_article_paragraphs(html):
+    """Get the text paragraphs of an article on Tagesschau.de
+
+    Args:
+        html: A string containing the article page.
+
+    Returns:
+        A list of unicode strings, one for each paragraph.
+    """
+    article = BeautifulSoup(html, "html.parser", parse_only=_article_paragraph_divs)
+    return [paragraph.getText()
+            for text_div in article.find_all('div', attrs={'class': 'mod modA modParagraph'})
+            for paragraph in text_div.find_all('p', attrs={'class': 'text small'})]
+
+
+def extract_synonyms(html):
+    """Get the synonyms listed on a synonym lookup page.
+
+    Args:
+        html: A string containing the lookup page.
+
+    Returns:
+        A list of unicode strings in the order they appear on the page, possibly containing duplicates.
+    """
+    site_text = BeautifulSoup(html, "html.parser", parse_only=_synonym_headings)
+    return [synonym.text
+            for synonym_collection in site_text.find_all('h4', class_='synonymsContent')
+            for synonym in synonym_collection.find_all('a')]
+
+
+def extract_syllable_heading(html):
+    """Get the heading containing the syllables of a word from a syllable lookup page.
+
+    Args:
+        html: A string containing the lookup page.
+
+    Returns:
+        A unicode string with the stripped text of the heading, or None if the page does not contain syllables.
+    """
+    site_text = BeautifulSoup(html, "html.parser", parse_only=_syllable_divs)
+    ress = site_text.find_all('div', class_='rom first', limit=1)
+    if len(ress) == 0:
+        return None
+    headings = ress[0].find_all('h2', limit=1)
+    if len(headings) == 0:
+        return None
+    return headings[0].text.strip()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing functions for downloading web pages for the scraper.
+
+Pages are requested over persistent (keep-alive) HTTP connections which are kept open per worker thread and host, so
+that consecutive requests to the same site do not pay for a new TCP handshake. Several pages can be fetched
+concurrently by a bounded number of worker threads. Requests to a host can be limited to a number of requests per
+second with set_rate_limit.
+
+If a cache is set with set_cache, pages are served from and stored in that cache.
+
+Where pages come from is decided by the backend set with set_backend:
+
+- LiveBackend (default) fetches pages from the web.
+- RecordBackend fetches pages from the web and writes them into an archive.
+- ReplayBackend serves pages from an archive without any network access, e.g. for offline profiling and regression
+  tests of the whole pipeline.
+"""
+
+import httplib
+import socket
+import threading
+import time
+import urlparse
+
+from multiprocessing.pool import ThreadPool
+from archive import ResponseArchive
+
+# default number of seconds to wait for a server before a request is considered failed
+DEFAULT_TIMEOUT = 15
+
+# default number of times a failed request is repeated
+DEFAULT_RETRIES = 2
+
+# default number of pages fetched at the same time
+DEFAULT_MAX_WORKERS = 8
+
+# maximum number of redirects followed for a single request
+MAX_REDIRECTS = 5
+
+USER_AGENT = 'Mozilla/5.0 (compatible; Tagespoet; +http://www.tagespoet.de)'
+
+# open connections of the current thread, keyed by (scheme, host)
+_local = threading.local()
+
+# cache used by live fetches, see set_cache
+_cache = None
+
+# backend used by fetch_url, see set_backend
+_backend = None
+
+
+class RateLimiter(object):
+    """Spaces out requests to each host so that a maximum number of requests per second is not exceeded.
+
+    The limiter can be shared by several threads.
+    """
+
+    def __init__(self):
+        # requests per second by host, None is the default for hosts without their own limit
+        self.rates = {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """Block until a request to a host is allowed."""
+        rate = self.rates.get(host, self.rates.get(None))
+        if not rate:
+            return
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + 1.0 / rate
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_rate_limiter = RateLimiter()
+
+
+def set_rate_limit(host, requests_per_second):
+    """Limit the number of requests sent to a host.
+
+    Only requests that go to the network count, pages served from the cache are not limited.
+
+    Args:
+        host: Host name, or None to set the limit for all hosts without their own limit.
+        requests_per_second: Maximum number of requests per second, or None to remove the limit.
+    """
+    _rate_limiter.rates[host] = requests_per_second
+
+
+def set_cache(cache):
+    """Set the cache used for all fetched pages.
+
+    Args:
+        cache: A httpcache.HTTPCache, or None to disable caching.
+    """
+    global _cache
+    _cache = cache
+
+
+def get_cache():
+    """Get the cache used for all fetched pages, see set_cache."""
+    return _cache
+
+
+def _get_connection(scheme, host, timeout):
+    """Get an open connection to a host for the current thread.
+
+    Args:
+        scheme: Either 'http' or 'https'.
+        host: Host name, optionally including the port.
+        timeout: Socket timeout in seconds.
+
+    Returns:
+        A httplib.HTTPConnection (or HTTPSConnection) that can be reused for further requests.
+    """
+    if not hasattr(_local, 'connections'):
+        _local.connections = {}
+    key = (scheme, host)
+    conn = _local.connections.get(key)
+    if conn is None:
+        if scheme == 'https':
+            conn = httplib.HTTPSConnection(host, timeout=timeout)
+        else:
+            conn = httplib.HTTPConnection(host, timeout=timeout)
+        _local.connections[key] = conn
+    return conn
+
+
+def _drop_connection(scheme, host):
+    """Close and forget the connection of the current thread to a host.
+
+    Args:
+        scheme: Either 'http' or 'https'.
+        host: Host name, optionally including the port.
+    """
+    conn = getattr(_local, 'connections', {}).pop((scheme, host), None)
+    if conn is not None:
+        conn.close()
+
+
+def _request(url, timeout, headers=None):
+    """Send a single GET request over a keep-alive connection.
+
+    Args:
+        url: Absolute URL of the page.
+        timeout: Socket timeout in seconds.
+        headers: Optional dictionary of additional request headers.
+
+    Returns:
+        A tuple of status code, a dictionary of (lower case) response headers and the response body.
+    """
+    parts = urlparse.urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    req_headers = {'User-Agent': USER_AGENT, 'Connection': 'keep-alive'}
+    if headers:
+        req_headers.update(headers)
+
+    _rate_limiter.wait(parts.hostname)
+    conn = _get_connection(parts.scheme, parts.netloc, timeout)
+    try:
+        conn.request('GET', path, headers=req_headers)
+        response = conn.getresponse()
+        body = response.read()
+    except (httplib.HTTPException, socket.error):
+        # connection might have been closed by the server, make sure the next attempt opens a new one
+        _drop_connection(parts.scheme, parts.netloc)
+        raise
+    if response.will_close:
+        _drop_connection(parts.scheme, parts.netloc)
+    return response.status, dict(response.getheaders()), body
+
+
+def fetch_live(url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+    """Get the content of a web page from the web.
+
+    If a cache is set, a cached page is returned without a request while it is fresh, and revalidated with a
+    conditional request otherwise. Redirects are followed. Failed requests (network errors, timeouts and server
+    errors) are repeated with a short pause in between.
+
+    Args:
+        url: Absolute URL of the page.
+        timeout: Seconds to wait for the server before a request is considered failed.
+        retries: Number of times a failed request is repeated.
+
+    Returns:
+        A string containing the body of the page.
+
+    Raises:
+        IOError: The page could not be fetched.
+    """
+    cache = _cache
+    entry = None
+    validators = None
+    if cache is not None:
+        entry = cache.get(url)
+        if entry is not None:
+            if cache.is_fresh(entry):
+                cache.count_hit()
+                return entry['body']
+            validators = cache.get_validators(entry)
+
+    attempt = 0
+    while True:
+        try:
+            cur_url = url
+            for _ in range(MAX_REDIRECTS + 1):
+                status, headers, body = _request(cur_url, timeout, validators)
+                if status in (301, 302, 303, 307, 308) and 'location' in headers:
+                    cur_url = urlparse.urljoin(cur_url, headers['location'])
+                    continue
+                break
+            else:
+                raise IOError('Too many redirects for ' + url)
+            if status >= 500:
+                raise IOError('Server error {0} for {1}'.format(status, url))
+            if cache is not None:
+                if status == 304 and entry is not None:
+                    # page has not changed since it was cached
+                    cache.count_revalidation()
+                    cache.refresh(entry)
+                    return entry['body']
+                cache.count_miss()
+                if status == 200:
+                    cache.store(url, headers, body)
+            return body
+        except (IOError, httplib.HTTPException, socket.error) as e:
+            attempt += 1
+            if attempt > retries:
+                raise IOError('Cannot fetch {0}: {1}'.format(url, e))
+            time.sleep(0.5 * attempt)
+
+
+class LiveBackend(object):
+    """Backend fetching pages from the web."""
+
+    def fetch(self, url, timeout, retries):
+        return fetch_live(url, timeout, retries)
+
+
+class RecordBackend(object):
+    """Backend fetching pages from the web and recording them in an archive."""
+
+    def __init__(self, archive):
+        """
+        Args:
+            archive: An archive.ResponseArchive the fetched pages are added to.
+        """
+        self.archive = archive
+
+    def fetch(self, url, timeout, retries):
+        body = fetch_live(url, timeout, retries)
+        self.archive.add(url, body)
+        return body
+
+
+class ReplayBackend(object):
+    """Backend serving pages from an archive, without any network access."""
+
+    def __init__(self, archive):
+        """
+        Args:
+            archive: An archive.ResponseArchive the pages are served from.
+        """
+        self.archive = archive
+
+    def fetch(self, url, timeout, retries):
+        body = self.archive.get(url)
+        if body is None:
+            raise IOError('Page not in archive: ' + url)
+        return body
+
+
+def set_backend(backend):
+    """Set the backend used by fetch_url.
+
+    Args:
+        backend: A LiveBackend, RecordBackend or ReplayBackend, or any object with a method fetch(url, timeout,
+            retries) returning the body of a page. With None, pages are fetched from the web.
+    """
+    global _backend
+    _backend = backend
+
+
+def make_backend(mode, archive_path):
+    """Make a backend by name.
+
+    Args:
+        mode: One of 'live', 'record' or 'replay'.
+        archive_path: Path of the archive used for recording and replaying.
+
+    Returns:
+        A backend that can be passed to set_backend.
+
+    Raises:
+        ValueError: The mode is unknown.
+    """
+    if mode == 'live':
+        return LiveBackend()
+    elif mode == 'record':
+        return RecordBackend(ResponseArchive(archive_path))
+    elif mode == 'replay':
+        return ReplayBackend(ResponseArchive(archive_path))
+    raise ValueError('Unknown fetch mode: ' + mode)
+
+
+def fetch_url(url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+    """Get the content of a web page through the backend set with set_backend.
+
+    Args:
+        url: Absolute URL of the page.
+        timeout: Seconds to wait for the server before a request is considered failed.
+        retries: Number of times a failed request is repeated.
+
+    Returns:
+        A string containing the body of the page.
+
+    Raises:
+        IOError: The page could not be fetched.
+    """
+    if _backend is None:
+        return fetch_live(url, timeout, retries)
+    return _backend.fetch(url, timeout, retries)
+
+
+def map_concurrently(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """Apply a function to all items using a bounded number of worker threads.
+
+    Args:
+        func: A function taking a single item.
+        items: A list of items.
+        max_workers: Maximum number of items processed at the same time. With 1, items are processed one after
+            another in the calling thread.
+
+    Returns:
+        A list of the results of func, in the same order as items.
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    pool = ThreadPool(min(max_workers, len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def fetch_urls(urls, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+    """Get the content of several web pages concurrently.
+
+    Args:
+        urls: A list of absolute URLs.
+        max_workers: Maximum number of pages fetched at the same time.
+        timeout: Seconds to wait for a server before a request is considered failed.
+        retries: Number of times a failed request is repeated.
+
+    Returns:
+        A list of strings containing the bodies of the pages, in the same order as urls.
+    """
+    return map_concurrently(lambda url: fetch_url(url, timeout, retries), urls, max_workers)
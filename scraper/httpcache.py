@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing an on-disk cache for web pages.
+
+Every page is stored in its own file, keyed by its URL, together with the validators (ETag, Last-Modified) sent by the
+server. A page younger than the time-to-live (TTL) of its host is served from disk without any request. An older page
+is revalidated with a conditional request, so an unchanged page costs an empty 304 response instead of the full page.
+The cache is bounded in size, the least recently used pages are evicted first.
+"""
+
+import cPickle as pickle
+import hashlib
+import os
+import threading
+import time
+import urlparse
+
+# default maximum size of all cached pages in bytes
+DEFAULT_MAX_SIZE = 200 * 1024 * 1024
+
+ENTRY_SUFFIX = '.cache'
+
+
+class HTTPCache(object):
+    """An on-disk cache for web pages with per-host TTLs and LRU eviction.
+
+    The cache can be shared by several threads.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE, default_ttl=0, ttls=None):
+        """
+        Args:
+            directory: Directory the cached pages are stored in. It is created if it does not exist.
+            max_size: Maximum size of all cached pages in bytes.
+            default_ttl: Seconds a page is served without revalidation, for hosts not listed in ttls. With 0, every
+                use of a cached page is revalidated with a conditional request.
+            ttls: A dictionary mapping host names to TTLs in seconds.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # counters are updated by several threads, see count_hit
+        self._count_lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._size = sum(os.path.getsize(path) for path in self._entry_paths())
+
+    def _entry_paths(self):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if name.endswith(ENTRY_SUFFIX)]
+
+    def _path(self, url):
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        return os.path.join(self.directory, hashlib.sha1(url).hexdigest() + ENTRY_SUFFIX)
+
+    def count_hit(self):
+        """Count a page served from the cache without a request."""
+        with self._count_lock:
+            self.hits += 1
+
+    def count_revalidation(self):
+        """Count a cached page served after the server confirmed that it has not changed."""
+        with self._count_lock:
+            self.revalidations += 1
+
+    def count_miss(self):
+        """Count a page downloaded, whether it was cached before or not."""
+        with self._count_lock:
+            self.misses += 1
+
+    def get_ttl(self, url):
+        """Get the TTL in seconds for a URL."""
+        return self.ttls.get(urlparse.urlsplit(url).hostname, self.default_ttl)
+
+    def get(self, url):
+        """Get a cached page.
+
+        Args:
+            url: Absolute URL of the page.
+
+        Returns:
+            A dictionary with the keys 'url', 'body', 'etag', 'last_modified' and 'stored_at' (time of the last
+            download or revalidation), or None if the page is not cached.
+        """
+        path = self._path(url)
+        try:
+            with open(path, 'rb') as entry_file:
+                entry = pickle.load(entry_file)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+        if entry.get('url') != url:
+            return None
+        # mark entry as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry):
+        """Check whether a cached page can be used without revalidation."""
+        return time.time() - entry['stored_at'] < self.get_ttl(entry['url'])
+
+    @staticmethod
+    def get_validators(entry):
+        """Get the headers for a conditional request for a cached page.
+
+        Returns:
+            A dictionary of request headers, empty if the server did not send any validators.
+        """
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, headers, body):
+        """Store a downloaded page.
+
+        Args:
+            url: Absolute URL of the page.
+            headers: A dictionary of the (lower case) response headers.
+            body: A string containing the body of the page.
+        """
+        entry = {'url': url,
+                 'body': body,
+                 'etag': headers.get('etag'),
+                 'last_modified': headers.get('last-modified'),
+                 'stored_at': time.time()}
+        self._write(entry)
+
+    def refresh(self, entry):
+        """Mark a cached page as revalidated, i.e. the server confirmed that it has not changed."""
+        entry['stored_at'] = time.time()
+        self._write(entry)
+
+    def _write(self, entry):
+        path = self._path(entry['url'])
+        tmp_path = '{0}.{1}.tmp'.format(path, threading.current_thread().ident)
+        data = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, 'wb') as entry_file:
+                entry_file.write(data)
+            os.rename(tmp_path, path)
+            self._size += len(data) - old_size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used pages until the cache is reduced to 90 % of its maximum size."""
+        entries = []
+        for path in self._entry_paths():
+            try:
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except OSError:
+                pass
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
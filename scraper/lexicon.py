@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing an indexed German lexicon with part-of-speech tags.
+
+The lexicon is read from a text file with one entry per line, consisting of a word and its part-of-speech tags (STTS),
+for example 'Abbruch NN'. Lines starting with ';' are comments. The parsed lexicon is kept in memory and stored as a
+pickled index next to the text file, so that the text file only has to be parsed again when it changes.
+"""
+
+import codecs
+import cPickle as pickle
+import os
+import threading
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'de-lexicon.txt')
+
+# version of the pickled index format, increase when the format changes
+INDEX_VERSION = 1
+
+# part-of-speech tags for common nouns and proper nouns
+NOUN_TAG = 'NN'
+NAME_TAG = 'NE'
+
+# lexica already loaded in this process, keyed by path of the text file
+_lexica = {}
+_lexica_lock = threading.Lock()
+
+
+class Lexicon(object):
+    """A lexicon of words and their part-of-speech tags.
+
+    Lookups are exact (case-sensitive) and take constant time.
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries: A dictionary mapping words (unicode) to tuples of part-of-speech tags.
+        """
+        self._entries = entries
+
+    def __contains__(self, word):
+        return word in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def get_tags(self, word):
+        """Get the part-of-speech tags of a word.
+
+        Args:
+            word: A unicode string.
+
+        Returns:
+            A tuple of tags, for example ('NE', 'NN'). The tuple is empty for unknown words and for words listed
+            without tags.
+        """
+        return self._entries.get(word, ())
+
+    def has_tag(self, word, tag):
+        """Check whether a word is listed with a specific part-of-speech tag."""
+        return tag in self._entries.get(word, ())
+
+    def is_noun(self, word):
+        """Check whether a word is listed as a common noun (NN)."""
+        return self.has_tag(word, NOUN_TAG)
+
+    def is_name(self, word):
+        """Check whether a word is listed as a proper noun (NE)."""
+        return self.has_tag(word, NAME_TAG)
+
+
+def parse_lexicon(path):
+    """Parse a lexicon text file.
+
+    Args:
+        path: Path of the lexicon text file.
+
+    Returns:
+        A dictionary mapping words to tuples of part-of-speech tags. Tags of words listed more than once are merged.
+    """
+    entries = {}
+    # share identical tag tuples between entries to keep the index small
+    tag_tuples = {}
+    with codecs.open(path, encoding='utf-8') as lexicon_file:
+        for line in lexicon_file:
+            if line.startswith(';'):
+                continue
+            fields = line.split()
+            if not fields:
+                continue
+            word = fields[0]
+            tags = tuple(str(tag) for tag in fields[1:])
+            if word in entries:
+                tags = entries[word] + tuple(tag for tag in tags if tag not in entries[word])
+            entries[word] = tag_tuples.setdefault(tags, tags)
+    return entries
+
+
+def _source_signature(path):
+    """Get a signature of a file that changes whenever the file changes."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+
+def _read_index(index_path, signature):
+    """Read a pickled index, returning None if it does not exist or is outdated."""
+    try:
+        with open(index_path, 'rb') as index_file:
+            index = pickle.load(index_file)
+    except (IOError, EOFError, pickle.UnpicklingError):
+        return None
+    if index.get('version') != INDEX_VERSION or index.get('signature') != signature:
+        return None
+    return index['entries']
+
+
+def _write_index(index_path, signature, entries):
+    """Write a pickled index. A failure to write is not fatal, the index is then rebuilt on the next run."""
+    tmp_path = index_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as index_file:
+            pickle.dump({'version': INDEX_VERSION, 'signature': signature, 'entries': entries}, index_file,
+                        pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, index_path)
+    except (IOError, OSError):
+        print 'Cannot write lexicon index ' + index_path
+
+
+def load_lexicon(path=DEFAULT_LEXICON_PATH):
+    """Load a lexicon.
+
+    The lexicon is loaded only once per process. The prebuilt index next to the text file is used if it is up to date,
+    otherwise the text file is parsed and the index is rebuilt.
+
+    Args:
+        path: Path of the lexicon text file.
+
+    Returns:
+        A Lexicon.
+    """
+    with _lexica_lock:
+        lexicon = _lexica.get(path)
+        if lexicon is None:
+            index_path = os.path.splitext(path)[0] + '.pickle'
+            signature = _source_signature(path)
+            entries = _read_index(index_path, signature)
+            if entries is None:
+                entries = parse_lexicon(path)
+                _write_index(index_path, signature, entries)
+            lexicon = Lexicon(entries)
+            _lexica[path] = lexicon
+        return lexicon
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing file locks shared by the processes making poems, i.e. main.py, the scheduler and workers."""
+
+import errno
+import fcntl
+
+
+class LockError(Exception):
+    """Raised if a lock is held by another process."""
+    pass
+
+
+class FileLock(object):
+    """An exclusive lock on a file, held by at most one process.
+
+    The lock is released when the process ends, even if it crashes.
+    """
+
+    def __init__(self, path, blocking=True):
+        """
+        Args:
+            path: Path of the lock file, created if needed.
+            blocking: If True, wait for the lock, otherwise raise LockError if it is held by another process.
+        """
+        self.path = path
+        self.blocking = blocking
+        self._file = None
+
+    def acquire(self):
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            lock_file.close()
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                raise LockError('Lock held by another process: ' + self.path)
+            raise
+        self._file = lock_file
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class RunLock(FileLock):
+    """Lock making sure only one poem is made at a time, waiting for a run of another process to finish."""
+
+    def __init__(self, data_dir, blocking=True):
+        """
+        Args:
+            data_dir: Directory for data kept between runs, ending with a slash.
+            blocking: If True, wait for the lock, otherwise raise LockError if it is held by another process.
+        """
+        super(RunLock, self).__init__(data_dir + 'poem_run.lock', blocking)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing functions for looking up synonyms and syllables of German words.
+
+Lookups for many words are resolved concurrently by resolve_synonyms. Synonyms are taken from a local thesaurus if one
+is set (see set_thesaurus), and syllables from an offline engine if one is set (see set_syllabifier). Only words
+missing in the thesaurus, or words the engine is uncertain about, are looked up remotely.
+"""
+
+import re
+import urllib
+import base64
+
+from fetcher import fetch_url, map_concurrently, DEFAULT_MAX_WORKERS
+from extractors import extract_synonyms, extract_syllable_heading
+from telemetry import stage
+
+# characters defining stress
+stress_chars = [u'\u0331', u'\u0323']
+
+consonants = [u'b', u'c', u'd', u'f', u'g', u'h', u'i', u'j', u'k', u'l', u'm', u'n', u'p', u'q', u'r', u's', u't',
+              u'v', u'w', u'x', u'y', u'z', u'ß']
+
+# local thesaurus used by resolve_synonyms, see set_thesaurus
+_thesaurus = None
+
+# whether synonyms of words missing in the thesaurus are looked up remotely
+_remote_synonym_fallback = True
+
+# offline engine for syllables used by resolve_synonyms, see set_syllabifier
+_syllabifier = None
+
+# whether syllables of words the engine is uncertain about are looked up remotely
+_remote_fallback = True
+
+# whether the engine passed its validation, so that syllables it is confident about can be stored
+_syllabifier_validated = False
+
+
+def set_thesaurus(thesaurus, remote_fallback=True):
+    """Set the local thesaurus used for synonyms by resolve_synonyms.
+
+    Args:
+        thesaurus: A thesaurus.FileThesaurus or thesaurus.MongoThesaurus, or None to look up synonyms of all words
+            remotely.
+        remote_fallback: If True, synonyms of words missing in the thesaurus are looked up remotely, otherwise these
+            words have no synonyms.
+    """
+    global _thesaurus, _remote_synonym_fallback
+    _thesaurus = thesaurus
+    _remote_synonym_fallback = remote_fallback
+
+
+def set_syllabifier(syllabifier, remote_fallback=True, validated=False):
+    """Set the offline engine used for syllables and stresses by resolve_synonyms.
+
+    Args:
+        syllabifier: A syllabify.Syllabifier, or None to look up syllables of all words remotely.
+        remote_fallback: If True, syllables of words the engine is uncertain about are looked up remotely, otherwise
+            the engine's guess is used.
+        validated: Whether the engine passed its validation (see syllabify.is_validated). Otherwise all its syllables
+            are unconfirmed, see make_subword.
+    """
+    global _syllabifier, _remote_fallback, _syllabifier_validated
+    _syllabifier = syllabifier
+    _remote_fallback = remote_fallback
+    _syllabifier_validated = validated
+
+
+def get_synonyms(qry_string):
+    """Get synonyms for a specific word in German.
+
+    Args:
+        qry_string: A string containing a word for that synnonyms should be found.
+
+    Returns:
+        A list of strings with synonyms for the qry_string.
+    """
+    r = fetch_url(base64.b64decode('***REMOVED***') + qry_string.lower() + '.php')
+    return parse_synonyms(r, qry_string)
+
+
+def parse_synonyms(html, qry_string):
+    """Get the synonyms of a word from its synonym lookup page.
+
+    Args:
+        html: A string containing the lookup page.
+        qry_string: The word that was looked up.
+
+    Returns:
+        A list of distinct strings with synonyms for the qry_string, not containing the qry_string itself.
+    """
+    res_list = []
+    for synonym in extract_synonyms(html):
+        if synonym not in res_list and synonym != qry_string:
+            res_list.append(synonym)
+    return res_list
+
+
+def substitute_all_by_empty(qry_string, qry_subs):
+    """Substitute all occurrences of specific string sequences by an empty sequence.
+    
+    Args:
+        qry_string: A string containing sequences to be replaced.
+        qry_subs: A list of strings containing sequences to be replaced.
+    
+    Returns:
+        The qry_string where all sequences defined in qry_subs are deleted.
+    """
+    tmp_str = qry_string
+    for sub in qry_subs:
+        tmp_str = tmp_str.replace(sub, '')
+    return tmp_str
+
+
+def get_syllable(qry_string):
+    """Get syllables for a specific German word
+
+    Args:
+        qry_string: A string containing a word for which syllables should be acquired.
+        qry_subs: A list of strings containing sequences to be replaced.
+
+    Returns:
+        A tuple of single syllables and stressed syllables. For example:
+
+        ['In', 'ter', 'ak', 'tion'], [0, 0, 0, 1]
+    """
+    url = urllib.quote(qry_string.encode('utf8'))
+    r = fetch_url(base64.b64decode('***REMOVED***') + url + base64.b64decode('***REMOVED***'))
+    return parse_syllables(r, qry_string)
+
+
+def parse_syllables(html, qry_string):
+    """Get the syllables of a word from its syllable lookup page.
+
+    Args:
+        html: A string containing the lookup page.
+        qry_string: The word that was looked up.
+
+    Returns:
+        A tuple of single syllables and stressed syllables as returned by get_syllable, or 0, 0 if the page does not
+        contain syllables matching the word.
+    """
+    single_syls = []
+    t = extract_syllable_heading(html)
+
+    # if error in site or no syllables found
+    if t is None:
+        return 0, 0
+
+    # get rid of stuff in brackets
+    end_pos = t.rfind('(')
+    if end_pos != -1:
+        t = t[:end_pos]
+
+    # get first syllables of word
+    first_syls = re.compile('([^ \-\t\n\r\f\v\·]*)[·]', re.UNICODE).findall(t)
+    if len(first_syls) == 0:
+        first_syls = re.compile('^(?:\S+\s){1}(\S+) ', re.UNICODE).findall(t)
+
+    for match in first_syls:
+        single_syls.append(match)
+
+    # get last syllable of word
+    last_syl = re.compile('[·]([^ \-\t\n\r\f\v\·]*)', re.UNICODE).findall(t)
+    if len(last_syl) > 0:
+        match = []
+        for match in last_syl:
+            pass
+        if match:
+            single_syls.append(substitute_all_by_empty(match, '1'))
+
+    # check if found and queried word match
+    tmp_res = ''.join(single_syls)
+    if substitute_all_by_empty(tmp_res, stress_chars) == qry_string:
+        # check for special cases where syllables and word do not match
+        # case 'Lektion, Region,...'
+        if len(single_syls) > 2:
+            if substitute_all_by_empty(single_syls[-1], stress_chars) == 'on' \
+                    and single_syls[-2][-1] == 'i' \
+                    and single_syls[-2][-2] in consonants:
+                single_syls[-2] = single_syls[-2] + single_syls[-1]
+                del (single_syls[-1])
+
+        stress_syls = [0] * len(single_syls)
+        # check for syllables
+        for idx, syl in enumerate(single_syls):
+            if any(x in syl for x in stress_chars):
+                stress_syls[idx] = 1
+        if not any(stress_syls):
+            # syllables not identifiable
+            # print qry_string + ' syllables cannot be identified.'
+            return 0, 0
+        else:
+            return single_syls, stress_syls
+    else:
+        # string mismatch
+        # print qry_string + ' is not ' + substitute_all_by_empty(tmp_res, stress_chars)
+        return 0, 0
+
+
+def make_subword(word, syls, stresses, unconfirmed=False):
+    """Make a subword, i.e. a synonym of a keyword as stored in the database.
+
+    Args:
+        word: The synonym.
+        syls: A list of the syllables of the synonym, as returned by get_syllable.
+        stresses: A list of the stresses of the syllables, as returned by get_syllable.
+        unconfirmed: Whether syllables and stresses are unconfirmed, i.e. come from the offline engine (see
+            set_syllabifier) without a validation of the engine or while the engine is uncertain about them.
+
+    Returns:
+        A dictionary with the keys 'word', 'syls', 'last_syls', 'stresses' and 'uses', and 'unconfirmed' set to True
+        if the syllables are unconfirmed. Such subwords must not be stored in the database.
+    """
+    subword = {'word': word,
+               'syls': syls,
+               'last_syls': substitute_all_by_empty(syls[-1], stress_chars),
+               'stresses': stresses,
+               'uses': 0}
+    if unconfirmed:
+        subword['unconfirmed'] = True
+    return subword
+
+
+def resolve_synonyms(keywords, max_workers=DEFAULT_MAX_WORKERS, syllable_cache=None):
+    """Get synonyms with syllables for several keywords.
+
+    Synonyms of all keywords are taken from the local thesaurus with a single lookup (see set_thesaurus) or fetched
+    concurrently. Then syllables of all synonyms are taken from the offline engine (see set_syllabifier) or fetched
+    concurrently, where a synonym occurring for several keywords is only fetched once.
+    Synonyms whose syllables cannot be identified are left out, as is a synonym that was already found for a previous
+    keyword. Each keyword is a synonym of itself.
+
+    Args:
+        keywords: A list of unicode strings.
+        max_workers: Maximum no. of lookups running at the same time.
+        syllable_cache: An optional syllable_cache.SyllableCache. Syllables of synonyms found in the cache are not
+            looked up, and the results of new remote lookups are added to the cache.
+
+    Returns:
+        A list with one list of subwords (see make_subword) for each keyword, in the same order as keywords.
+    """
+    found = {}
+    if _thesaurus is not None:
+        with stage('thesaurus_lookups') as timing:
+            found = _thesaurus.get_many(keywords)
+            timing.count = len(keywords)
+    remote_keywords = [keyword for keyword in keywords if keyword not in found] \
+        if _thesaurus is None or _remote_synonym_fallback else []
+    with stage('synonym_lookups') as timing:
+        looked_up = dict(zip(remote_keywords, map_concurrently(
+            get_synonyms, [keyword.encode('utf-8') for keyword in remote_keywords], max_workers)))
+        timing.count = len(remote_keywords)
+    synonym_lists = [list(found.get(keyword, looked_up.get(keyword, []))) for keyword in keywords]
+    for keyword, synonyms in zip(keywords, synonym_lists):
+        # add origin word as synonym
+        synonyms.append(keyword)
+
+    # get syllables of each distinct synonym only once
+    unique_synonyms = []
+    seen = set()
+    for synonyms in synonym_lists:
+        for syn in synonyms:
+            if syn not in seen:
+                seen.add(syn)
+                unique_synonyms.append(syn)
+    syllables = {}
+    # synonyms whose syllables come from the offline engine, but are not confirmed by its validation
+    unconfirmed = set()
+    if _syllabifier is not None:
+        with stage('syllable_engine') as timing:
+            uncertain = []
+            for syn in unique_synonyms:
+                syls, stresses, confident = _syllabifier.analyze(syn)
+                if confident or (not _remote_fallback and syls is not None):
+                    syllables[syn] = syls, stresses
+                    if not (confident and _syllabifier_validated):
+                        unconfirmed.add(syn)
+                else:
+                    uncertain.append(syn)
+            timing.count = len(unique_synonyms)
+        if _remote_fallback:
+            unique_synonyms = uncertain
+        else:
+            syllables.update((syn, (0, 0)) for syn in uncertain)
+            unique_synonyms = []
+    with stage('syllable_lookups') as timing:
+        if syllable_cache is not None:
+            syllables.update(syllable_cache.get_many(unique_synonyms))
+            unique_synonyms = [syn for syn in unique_synonyms if syn not in syllables]
+        looked_up = dict(zip(unique_synonyms, map_concurrently(get_syllable, unique_synonyms, max_workers)))
+        if syllable_cache is not None:
+            syllable_cache.put_many(looked_up)
+        syllables.update(looked_up)
+        timing.count = len(looked_up)
+
+    results = []
+    ctrlwords = set()
+    for synonyms in synonym_lists:
+        subwords = []
+        for syn in synonyms:
+            tmp_syls, tmp_stress_syls = syllables[syn]
+            if tmp_syls != 0 and tmp_stress_syls != 0:
+                # syllables could be received, avoid duplicate synonyms
+                ctrlword = substitute_all_by_empty(syn, stress_chars)
+                if ctrlword not in ctrlwords:
+                    subwords.append(make_subword(syn, tmp_syls, tmp_stress_syls, syn in unconfirmed))
+                    ctrlwords.add(ctrlword)
+        results.append(subwords)
+    return results
@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing the stages of making a poem from the news, as functions without side effects at import.
+
+The stages are:
+
+1. build_word_cloud: get the most frequent nouns from the news.
+2. resolve_candidates: get synonyms with syllables of the nouns, from the database or looked up on the web.
+3. solve_poem: fit the candidates into a poem scheme.
+4. store_poem: add the poem to the database.
+
+make_poem runs all stages, adding keywords until a poem can be made. setup configures fetching and caching once per
+process. PoemWorker keeps the database connection, lexicon, stemmer and caches of a process warm and makes poems for
+jobs queued in the database.
+"""
+
+import time
+
+from datetime import timedelta, datetime
+
+from scraper import get_tagesschau_words, stemmer
+from fetcher import set_cache, get_cache, set_backend, make_backend, set_rate_limit
+from httpcache import HTTPCache
+from lookup import resolve_synonyms, set_syllabifier, set_thesaurus
+from syllabify import load_syllabifier, is_validated, VALIDATION_NAME
+from syllable_cache import SyllableCache
+from solver import CandidatePool, SolverBudget
+from batch import generate_poems, make_seeds
+from schemes import load_scheme, DEFAULT_SCHEME
+from rhymes import exact_rhyme_key
+from locks import RunLock
+from poem_html import render_fragments
+from telemetry import stage, record, start_run, finish_run, set_log_path, get_hit_counts, diff_hit_counts, \
+    DEFAULT_LOG_NAME
+
+# default no. of synonyms and syllables looked up at the same time
+DEFAULT_LOOKUP_WORKERS = 8
+
+# default no. of candidate poems solved in parallel, the best one is stored
+DEFAULT_NO_OF_CANDIDATES = 8
+
+# default limits: each candidate poem is searched for up to 60 s, starting with 20 keywords and adding 5 keywords up
+# to 35 keywords if no poem can be made
+DEFAULT_BUDGET = SolverBudget(max_time=60, min_keywords=20, max_keywords=35, keyword_step=5)
+
+# seconds between checks for new jobs of a worker
+DEFAULT_POLL_INTERVAL = 10
+
+
+def get_stem_table_path(data_dir):
+    """Get the path of the stem table kept between runs."""
+    return data_dir + 'stem_table.pickle'
+
+
+def setup(data_dir, fetch_mode='live', fetch_archive=None, syllable_mode='auto', thesaurus=None,
+          synonym_mode='offline'):
+    """Configure fetching, caching, syllable lookups and telemetry for the current process.
+
+    Args:
+        data_dir: Directory for data kept between runs, ending with a slash.
+        fetch_mode: One of 'live', 'record' or 'replay', see fetcher.make_backend.
+        fetch_archive: Path of the archive for recording and replaying, by default 'responses' in data_dir.
+        syllable_mode: Where syllables come from: 'offline' from the offline engine (see syllabify.py), looking up
+            words it is uncertain about remotely, 'offline-only' from the engine alone, 'remote' from remote lookups
+            alone, or 'auto' like 'offline' if the engine passed its validation ('python syllabify.py --validate')
+            and like 'remote' otherwise. Syllables of the engine are only stored if it passed its validation, so
+            'offline' and 'offline-only' without a validation are experiments.
+        thesaurus: An optional local thesaurus for synonyms, see thesaurus.open_thesaurus.
+        synonym_mode: Where synonyms come from if a thesaurus is given: 'offline' from the thesaurus, looking up words
+            missing in it remotely, 'offline-only' from the thesaurus alone, or 'remote' from remote lookups alone.
+
+    Raises:
+        ValueError: Unknown syllable or synonym mode.
+    """
+    if syllable_mode not in ('auto', 'offline', 'offline-only', 'remote'):
+        raise ValueError('Unknown syllable mode: ' + syllable_mode)
+    if synonym_mode not in ('offline', 'offline-only', 'remote'):
+        raise ValueError('Unknown synonym mode: ' + synonym_mode)
+
+    # cache web pages between runs, news pages are revalidated on every run while synonyms and syllables of a word
+    # hardly ever change
+    set_cache(HTTPCache(data_dir + 'http_cache', default_ttl=30 * 24 * 3600, ttls={'www.tagesschau.de': 0}))
+
+    # fetch pages from the web (live), or record them into or replay them from an archive, e.g. for offline runs
+    set_backend(make_backend(fetch_mode, fetch_archive or data_dir + 'responses'))
+
+    # do not send more than a few requests per second to any host
+    set_rate_limit(None, 5)
+
+    # split words into syllables offline once the engine agrees with the syllables looked up remotely, which is much
+    # faster than looking them up
+    syllabifier = load_syllabifier() if syllable_mode != 'remote' else None
+    validated = syllabifier is not None and is_validated(data_dir + VALIDATION_NAME, syllabifier)
+    if syllable_mode == 'remote' or (syllable_mode == 'auto' and not validated):
+        set_syllabifier(None)
+    else:
+        set_syllabifier(syllabifier, remote_fallback=syllable_mode != 'offline-only', validated=validated)
+
+    # take synonyms from the local thesaurus, which is much faster than looking them up
+    if synonym_mode == 'remote':
+        set_thesaurus(None)
+    else:
+        set_thesaurus(thesaurus, remote_fallback=synonym_mode == 'offline')
+
+    # reuse stems of words from previous runs
+    stemmer.load_table(get_stem_table_path(data_dir))
+
+    # keep time and counts of the stages of each run, see telemetry.py
+    set_log_path(data_dir + DEFAULT_LOG_NAME)
+
+
+def save_state(data_dir):
+    """Keep state worth reusing, i.e. the stem table, for the next run."""
+    stemmer.save_table(get_stem_table_path(data_dir))
+
+
+def append_log(data_dir, poem_id, no_of_words, seconds):
+    """Add a line about a run to the scraper log, i.e. its date, 'ok' or 'fail', no. of keywords and duration.
+
+    Args:
+        data_dir: Directory for data kept between runs, ending with a slash.
+        poem_id: The _id of the poem made, or None if no poem could be made.
+        no_of_words: No. of keywords of the last attempt.
+        seconds: Duration of the run.
+    """
+    status = 'ok' if poem_id is not None else 'fail'
+    with open(data_dir + "scraper_log.txt", "a") as scraper_log:
+        scraper_log.write("{0} {1} {2} {3:.1f}s\n".format(str(datetime.utcnow()), status, str(no_of_words), seconds))
+
+
+def build_word_cloud(no_of_words):
+    """Get the keywords for a poem.
+
+    Args:
+        no_of_words: No. of keywords.
+
+    Returns:
+        A list of unicode strings, most frequent first, see scraper.get_tagesschau_words.
+    """
+    return get_tagesschau_words(no_of_words)
+
+
+def resolve_candidates(db, word_cloud, syllable_cache=None, rhyme_key=exact_rhyme_key,
+                       lookup_workers=DEFAULT_LOOKUP_WORKERS):
+    """Get the candidate words for a poem, i.e. the keywords and their synonyms with syllables.
+
+    Synonyms of keywords already in the database are taken from there with a single query. The others are looked up
+    and added to the database with a single bulk insert, except keywords with synonyms whose syllables are unconfirmed
+    (see lookup.make_subword), which are resolved again in the next run.
+
+    Args:
+        db: A pymongo database.
+        word_cloud: A list of keywords, see build_word_cloud.
+        syllable_cache: An optional syllable_cache.SyllableCache.
+        rhyme_key: A function mapping a last syllable to its rhyme key, see rhymes.py.
+        lookup_workers: Maximum no. of lookups running at the same time.
+
+    Returns:
+        A solver.CandidatePool.
+    """
+    subwords_by_word = {}
+    with stage('db_reads') as timing:
+        for doc in db.synonyms.find({'word': {'$in': word_cloud}}, {'word': 1, 'subword': 1, '_id': 0}):
+            subwords_by_word[doc['word']] = doc.get('subword', [])
+        timing.count = len(subwords_by_word)
+
+    new_words = [word for word in word_cloud if word not in subwords_by_word]
+    new_docs = []
+    for word, subwords in zip(new_words, resolve_synonyms(new_words, lookup_workers, syllable_cache)):
+        subwords_by_word[word] = subwords
+        if any(subword.get('unconfirmed') for subword in subwords):
+            continue
+        doc = {'word': word}
+        if subwords:
+            doc['subword'] = subwords
+        new_docs.append(doc)
+    if new_docs:
+        with stage('db_writes') as timing:
+            db.synonyms.insert(new_docs)
+            timing.count = len(new_docs)
+
+    words = []
+    stresses = []
+    last_syls = []
+    keyword_nxs = []
+    for keyword_nx, word in enumerate(word_cloud):
+        for subword in subwords_by_word[word]:
+            words.append(subword['word'])
+            stresses.append(subword['stresses'])
+            last_syls.append(subword['last_syls'])
+            keyword_nxs.append(keyword_nx)
+    return CandidatePool(words, stresses, last_syls, rhyme_key, keyword_nxs)
+
+
+def solve_poem(pool, scheme, no_of_candidates=DEFAULT_NO_OF_CANDIDATES, base_seed=None, budget=DEFAULT_BUDGET):
+    """Fit the candidate words into a poem scheme.
+
+    Several candidate poems are solved in parallel, see batch.generate_poems. Pools failing the feasibility check of
+    the scheme are rejected without solving.
+
+    Args:
+        pool: A solver.CandidatePool, see resolve_candidates.
+        scheme: A schemes.PoemScheme.
+        no_of_candidates: No. of candidate poems.
+        base_seed: Seed of the first candidate poem, random if None.
+        budget: A solver.SolverBudget limiting the search for each candidate poem.
+
+    Returns:
+        A tuple of the candidates as returned by batch.generate_poems, best first, and a string describing why the
+        pool cannot fill the scheme, or None. There are no candidates if the pool fails the feasibility check.
+    """
+    infeasibility = scheme.find_infeasibility(pool)
+    if infeasibility is not None:
+        return [], infeasibility
+    with stage('solver') as timing:
+        candidates = generate_poems(pool, scheme.lines, scheme.rhyme_scheme, make_seeds(no_of_candidates, base_seed),
+                                    budget=budget)
+        timing.count = len(candidates)
+    return candidates, None
+
+
+def store_poem(db, word_cloud, pool, candidate, scheme):
+    """Add a poem to the database.
+
+    Args:
+        db: A pymongo database.
+        word_cloud: The keywords of the poem.
+        pool: The solver.CandidatePool the poem was solved from.
+        candidate: A complete candidate poem as returned by solve_poem.
+        scheme: The schemes.PoemScheme of the poem.
+
+    Returns:
+        The _id of the poem in the database.
+    """
+    score, seed, result = candidate
+    poem = [[pool.words[nx].title() for nx in line] for line in result.lines]
+    with stage('db_writes') as timing:
+        timing.count = 1
+        return db.poems.insert({
+            'date': datetime.utcnow() + timedelta(hours=6),
+            'keywords': word_cloud,
+            'poem': poem,
+            # rendered once here instead of by the website on every request
+            'html': render_fragments(poem, word_cloud),
+            'scheme': scheme.name,
+            'seed': seed,
+            'score': score
+        })
+
+
+def make_poem(db, scheme, budget=DEFAULT_BUDGET, syllable_cache=None, rhyme_key=exact_rhyme_key,
+              no_of_candidates=DEFAULT_NO_OF_CANDIDATES, base_seed=None):
+    """Make a poem from the news and add it to the database.
+
+    Starts with the no. of keywords of the budget and adds keywords until a poem can be made or the budget does not
+    allow more keywords. The run is added to the telemetry log, see telemetry.py.
+
+    Args:
+        db: A pymongo database.
+        scheme: A schemes.PoemScheme.
+        budget: A solver.SolverBudget.
+        syllable_cache: An optional syllable_cache.SyllableCache.
+        rhyme_key: A function mapping a last syllable to its rhyme key, see rhymes.py.
+        no_of_candidates: No. of candidate poems solved for each no. of keywords.
+        base_seed: Seed of the first candidate poem, random if None.
+
+    Returns:
+        A tuple of the _id of the poem, or None if no poem could be made, and the no. of keywords of the last attempt.
+    """
+    start_run()
+    caches = {'http': get_cache(), 'syllables': syllable_cache}
+    start_counts = dict((name, get_hit_counts(cache)) for name, cache in caches.iteritems() if cache is not None)
+    poem_id = None
+    status = 'error'
+    try:
+        poem_id, cur_no_of_words = _make_poem(db, scheme, budget, syllable_cache, rhyme_key, no_of_candidates,
+                                              base_seed)
+        status = 'ok' if poem_id is not None else 'fail'
+        return poem_id, cur_no_of_words
+    finally:
+        finish_run(status=status, poem_id=str(poem_id) if poem_id is not None else None, scheme=scheme.name,
+                   caches=dict((name, diff_hit_counts(counts, get_hit_counts(caches[name])))
+                               for name, counts in start_counts.iteritems()))
+
+
+def _make_poem(db, scheme, budget, syllable_cache, rhyme_key, no_of_candidates, base_seed):
+    cur_no_of_words = None
+    for round_nx, cur_no_of_words in enumerate(budget.get_keyword_counts()):
+        # rounds after the first one needed more keywords
+        record('escalation_rounds', round_nx)
+        record('keywords', cur_no_of_words)
+
+        # get word cloud from German news site Tagesschau through scraper
+        word_cloud = build_word_cloud(cur_no_of_words)
+        print 'KW: ' + ' '.join(word_cloud).encode('utf-8')
+
+        pool = resolve_candidates(db, word_cloud, syllable_cache, rhyme_key)
+
+        # solve poem
+        # strategy: search systematically for words fitting the poem scheme, so a poem is found whenever the words
+        # allow one and more keywords are only fetched when they do not, then keep the best of several candidate
+        # poems
+        poem_find_start_time = time.time()
+        candidates, infeasibility = solve_poem(pool, scheme, no_of_candidates, base_seed, budget)
+        print ''
+        print 'Elapsed time: {0:.1f} s '.format(time.time() - poem_find_start_time)
+        if candidates:
+            score, seed, result = candidates[0]
+            stats = result.stats
+            record('solver', stats.as_dict())
+            print 'Solver (seed {0}): {1} draws, {2} resets, {3} prunings, rejections {4}'.format(
+                seed, stats.draws, stats.resets, stats.prunings,
+                ', '.join('{0} {1}'.format(reason, count) for reason, count in sorted(stats.rejections.iteritems())))
+            print 'Solver time: rhymes {0:.3f} s, lines {1}'.format(
+                stats.rhyme_time, ' '.join('{0:.3f}'.format(line_time) for line_time in stats.line_times))
+
+        if candidates and candidates[0][2].complete:
+            # poem resolved successfully
+            score, seed, result = candidates[0]
+            print 'Best of {0} poems: seed {1}, score {2:.2f}'.format(len(candidates), seed, score)
+            return store_poem(db, word_cloud, pool, candidates[0], scheme), cur_no_of_words
+
+        # poem cannot be resolved with given words, try with more keywords (and therefore more synonyms and words)
+        if infeasibility:
+            print '+++ Poem cannot be resolved: {0}. +++'.format(infeasibility)
+        elif candidates[0][2].exhausted:
+            print '+++ Poem not resolved within budget, best try has {0} lines. +++'.format(len(candidates[0][2].lines))
+        else:
+            print '+++ Poem cannot be resolved. +++'
+
+    print '+++ Poem generation not successful. +++'
+    return None, cur_no_of_words
+
+
+class PoemWorker(object):
+    """A long-lived process making poems for jobs queued in the database.
+
+    A job is a document in the collection poem_jobs with the status 'queued' and optionally the name of a scheme
+    ('scheme'). Jobs are taken oldest first (by 'created'). When a job is done, its status is 'done' and 'poem_id'
+    refers to the new poem, or its status is 'failed'.
+    """
+
+    def __init__(self, db, data_dir, budget=DEFAULT_BUDGET, rhyme_key=exact_rhyme_key,
+                 no_of_candidates=DEFAULT_NO_OF_CANDIDATES):
+        """
+        Args:
+            db: A pymongo database.
+            data_dir: Directory for data kept between runs, ending with a slash. setup must have been called with it.
+            budget: A solver.SolverBudget for each poem.
+            rhyme_key: A function mapping a last syllable to its rhyme key, see rhymes.py.
+            no_of_candidates: No. of candidate poems solved for each poem.
+        """
+        self.db = db
+        self.data_dir = data_dir
+        self.budget = budget
+        self.rhyme_key = rhyme_key
+        self.no_of_candidates = no_of_candidates
+        self.syllable_cache = SyllableCache(db.syllables)
+        self._schemes = {}
+
+    def get_scheme(self, name):
+        """Get a scheme by name, loading each scheme only once."""
+        if name not in self._schemes:
+            self._schemes[name] = load_scheme(name)
+        return self._schemes[name]
+
+    def run_job(self, job):
+        """Make a poem for a job.
+
+        Args:
+            job: A job document, see PoemWorker.
+
+        Returns:
+            The _id of the poem, or None if no poem could be made.
+        """
+        poem_id = None
+        try:
+            # do not make a poem (or write the stem table) at the same time as the scheduler or main.py
+            with RunLock(self.data_dir):
+                try:
+                    poem_id, _ = make_poem(self.db, self.get_scheme(job.get('scheme', DEFAULT_SCHEME)), self.budget,
+                                           self.syllable_cache, self.rhyme_key, self.no_of_candidates)
+                finally:
+                    save_state(self.data_dir)
+        finally:
+            self.db.poem_jobs.update({'_id': job['_id']},
+                                     {'$set': {'status': 'done' if poem_id is not None else 'failed',
+                                               'poem_id': poem_id, 'finished': datetime.utcnow()}})
+        return poem_id
+
+    def take_job(self):
+        """Take the oldest queued job, so no other worker takes it.
+
+        Returns:
+            The job document, or None if no job is queued.
+        """
+        return self.db.poem_jobs.find_and_modify({'status': 'queued'},
+                                                 {'$set': {'status': 'running', 'started': datetime.utcnow()}},
+                                                 sort=[('created', 1)], new=True)
+
+    def serve(self, poll_interval=DEFAULT_POLL_INTERVAL):
+        """Run jobs as they are queued, forever."""
+        while True:
+            job = self.take_job()
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            try:
+                self.run_job(job)
+            except Exception as e:
+                # keep serving other jobs
+                print '+++ Job {0} failed: {1} +++'.format(job['_id'], e)
+
+
+def queue_job(db, scheme=DEFAULT_SCHEME):
+    """Queue a job for a PoemWorker.
+
+    Args:
+        db: A pymongo database.
+        scheme: Name of the scheme of the poem.
+
+    Returns:
+        The _id of the job.
+    """
+    return db.poem_jobs.insert({'status': 'queued', 'scheme': scheme, 'created': datetime.utcnow()})
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing the HTML fragments of a poem as shown on the website.
+
+The fragments are rendered once when a poem is stored (see pipeline.store_poem) and kept in the poem's document as
+'html', so the website does not render them on every request. Documents without current fragments, e.g. of poems
+stored before, are rendered on the fly by get_fragments.
+
+Run as a script to add the fragments to all poems in the database that lack current ones:
+
+    python poem_html.py [--all]
+"""
+
+import argparse
+import cgi
+import os
+
+# version of the fragments, increase when their markup changes so that stored fragments are rendered again
+HTML_VERSION = 1
+
+# ids of the lines of the poem of the day and of an archived poem, for CSS
+POEM_LINE_ID = 'poemline'
+ARCHIVE_LINE_ID = 'poemarchiveline'
+
+
+def make_poem_html(poem, pid):
+    """Make a section of HTML code for a poem.
+
+    Args:
+        poem: A poem defined as a list (rows) of lists (words in rows).
+        pid: HTML <p> tag ID attribute for CSS identification.
+
+    Returns:
+        A unicode string containing HTML code for displaying a poem, with words escaped, for example:
+
+        '<p id="poemline">Day, Morning, Sun,</p><p id="poemline">Birds, Trees, Grass.</p>'
+    """
+    start_tag = u'<p id="' + pid + u'">'
+    lines = [[cgi.escape(word, True) for word in line] for line in poem]
+    res_html = [start_tag + u''.join(word + u', ' for word in line) + u'</p>' for line in lines[:-1]]
+    res_html.append(start_tag + u', '.join(lines[-1]) + u'.</p>')
+    return u''.join(res_html)
+
+
+def make_keyword_html(keywords):
+    """Make a section of HTML code for a list of keywords.
+
+    Args:
+        keywords: A list of strings where each string is a keyword.
+
+    Returns:
+        A unicode string containing HTML code for displaying keywords, with keywords escaped, for example:
+
+        '<strong>Ausgangsw&ouml;rter:</strong> Nature, Plants, Fauna'
+    """
+    return u'<strong>Ausgangsw&ouml;rter:</strong> ' + u', '.join(cgi.escape(word, True) for word in keywords)
+
+
+def render_fragments(poem, keywords):
+    """Render the HTML fragments of a poem.
+
+    Args:
+        poem: A poem defined as a list (rows) of lists (words in rows).
+        keywords: A list of the keywords of the poem.
+
+    Returns:
+        A dictionary with the version of the fragments ('version'), the poem as poem of the day ('poem'), the poem as
+        archived poem ('archive_poem') and the keywords ('keywords').
+    """
+    return {'version': HTML_VERSION,
+            'poem': make_poem_html(poem, POEM_LINE_ID),
+            'archive_poem': make_poem_html(poem, ARCHIVE_LINE_ID),
+            'keywords': make_keyword_html(keywords)}
+
+
+def get_fragments(doc):
+    """Get the HTML fragments of a poem, rendering them if the document has no current ones.
+
+    Args:
+        doc: A document of the collection poems.
+
+    Returns:
+        A dictionary of fragments, see render_fragments.
+    """
+    fragments = doc.get('html')
+    if fragments is not None and fragments.get('version') == HTML_VERSION:
+        return fragments
+    return render_fragments(doc['poem'], doc['keywords'])
+
+
+def backfill(collection, render_all=False):
+    """Add the HTML fragments to poems lacking current ones.
+
+    Args:
+        collection: The pymongo collection of poems.
+        render_all: If True, render the fragments of all poems again.
+
+    Returns:
+        The no. of poems updated.
+    """
+    spec = {} if render_all else {'html.version': {'$ne': HTML_VERSION}}
+    no_of_poems = 0
+    for doc in collection.find(spec, {'poem': 1, 'keywords': 1}):
+        collection.update({'_id': doc['_id']}, {'$set': {'html': render_fragments(doc['poem'], doc['keywords'])}})
+        no_of_poems += 1
+    return no_of_poems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add HTML fragments to the poems in the database.')
+    parser.add_argument('--all', action='store_true', help='render the fragments of all poems again')
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+
+    db = MongoClient(os.environ['OPENSHIFT_MONGODB_DB_URL']).tagespoet
+    print 'Updated {0} poems'.format(backfill(db.poems, args.all))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing an index of candidate words by rhyme.
+
+Two words rhyme if the rhyme keys of their last syllables are equal. exact_rhyme_key compares the whole last syllable,
+loose_rhyme_key only its vowel nucleus and coda (e.g. 'Stand' and 'Hand' as well as 'Wand' and 'Verstand'), which
+lets more words rhyme.
+"""
+
+vowels = frozenset(u'aeiouyäöü')
+
+
+def exact_rhyme_key(last_syl):
+    """Get the rhyme key of a last syllable, i.e. the whole syllable.
+
+    Args:
+        last_syl: A unicode string with the last syllable of a word, without stress characters.
+
+    Returns:
+        The syllable in lower case.
+    """
+    return last_syl.lower()
+
+
+def loose_rhyme_key(last_syl):
+    """Get the loose rhyme key of a last syllable, i.e. its vowel nucleus and coda.
+
+    Args:
+        last_syl: A unicode string with the last syllable of a word, without stress characters.
+
+    Returns:
+        The syllable in lower case, starting at its first vowel. The 'u' of 'qu' counts to the onset. A syllable
+        without vowels is returned as a whole.
+    """
+    syl = last_syl.lower()
+    for nx, char in enumerate(syl):
+        if char in vowels and not (char == u'u' and nx > 0 and syl[nx - 1] == u'q'):
+            return syl[nx:]
+    return syl
+
+
+class RhymeIndex(object):
+    """Candidate words grouped by rhyme class, built once per candidate pool.
+
+    Attributes:
+        keys: A list with the rhyme key of each candidate.
+    """
+
+    def __init__(self, last_syls, rhyme_key=exact_rhyme_key):
+        """
+        Args:
+            last_syls: A list with the last syllable of each candidate, without stress characters.
+            rhyme_key: A function mapping a last syllable to its rhyme key.
+        """
+        self.keys = [rhyme_key(last_syl) for last_syl in last_syls]
+        self._ids = {}
+        for nx, key in enumerate(self.keys):
+            self._ids.setdefault(key, []).append(nx)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def get_classes(self):
+        """Get the rhyme keys of all rhyme classes."""
+        return self._ids.keys()
+
+    def get_ids(self, key):
+        """Get the candidates of a rhyme class.
+
+        Args:
+            key: A rhyme key.
+
+        Returns:
+            A list of indices of candidates, in increasing order.
+        """
+        return self._ids.get(key, [])
+
+    def count(self, key):
+        """Get the no. of candidates of a rhyme class.
+
+        Args:
+            key: A rhyme key.
+        """
+        return len(self._ids.get(key, ()))
+
+    def rhymes_with(self, nx, other_nx):
+        """Check whether two candidates rhyme.
+
+        Args:
+            nx: Index of a candidate.
+            other_nx: Index of another candidate.
+        """
+        return self.keys[nx] == self.keys[other_nx]
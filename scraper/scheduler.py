@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Script running a scheduler that makes the daily poem at a fixed time.
+
+The scheduler keeps running and, during the hours before the poem is published, pre-warms the expensive stages every
+now and then: it fetches the articles and resolves synonyms and syllables of their keywords, so that the database and
+caches hold nearly everything when the poem is made. A failed run is retried with increasing pauses.
+
+Only one scheduler runs at a time: a second one exits right away. So the script can be started regularly, e.g. by a
+cron job, to restart the scheduler if it stopped. Runs of the scheduler, main.py and workers never overlap, see
+locks.RunLock.
+
+The pipeline (with nltk, numpy, pymongo and the lexicon) is only imported once the scheduler lock is acquired, so that
+a second scheduler exits quickly.
+"""
+
+import json
+import locale
+import os
+import time
+
+from datetime import datetime, timedelta
+
+from locks import FileLock, LockError, RunLock
+
+# time of day (server time) the poem is made at
+DEFAULT_PUBLISH_TIME = '06:15'
+
+# hours before the publish time during which stages are pre-warmed
+DEFAULT_PREWARM_HOURS = 4
+
+# seconds between pre-warm runs
+DEFAULT_PREWARM_INTERVAL = 3600
+
+# no. of times a failed run is repeated
+DEFAULT_MAX_RETRIES = 5
+
+# seconds before the first retry, doubled for each further retry up to the maximum
+DEFAULT_RETRY_DELAY = 60
+DEFAULT_MAX_RETRY_DELAY = 1800
+
+# hours after the publish time during which a missed poem is still made, e.g. after the scheduler was restarted
+DEFAULT_CATCH_UP_HOURS = 6
+
+# seconds between checks whether something is due
+TICK = 30
+
+
+def parse_time_of_day(time_string):
+    """Parse a time of day like '06:15' into a tuple of hour and minute.
+
+    Raises:
+        ValueError: The string is no time of day.
+    """
+    hour, minute = [int(part) for part in time_string.split(':')]
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError('Invalid time of day: ' + time_string)
+    return hour, minute
+
+
+class Scheduler(object):
+    """Scheduler making a poem every day at the publish time."""
+
+    def __init__(self, db, data_dir, scheme, publish_time=DEFAULT_PUBLISH_TIME, prewarm_hours=DEFAULT_PREWARM_HOURS,
+                 prewarm_interval=DEFAULT_PREWARM_INTERVAL, max_retries=DEFAULT_MAX_RETRIES,
+                 retry_delay=DEFAULT_RETRY_DELAY, max_retry_delay=DEFAULT_MAX_RETRY_DELAY,
+                 catch_up_hours=DEFAULT_CATCH_UP_HOURS, budget=None):
+        """
+        Args:
+            db: A pymongo database.
+            data_dir: Directory for data kept between runs, ending with a slash. pipeline.setup must have been called
+                with it.
+            scheme: The schemes.PoemScheme of the poems.
+            publish_time: Time of day the poem is made at, e.g. '06:15'.
+            prewarm_hours: Hours before the publish time during which stages are pre-warmed.
+            prewarm_interval: Seconds between pre-warm runs.
+            max_retries: No. of times a failed run is repeated.
+            retry_delay: Seconds before the first retry, doubled for each further retry.
+            max_retry_delay: Maximum no. of seconds between retries.
+            catch_up_hours: Hours after the publish time during which a missed poem is still made.
+            budget: A solver.SolverBudget for each poem, by default pipeline.DEFAULT_BUDGET.
+        """
+        import pipeline
+        from syllable_cache import SyllableCache
+
+        self.db = db
+        self.data_dir = data_dir
+        self.scheme = scheme
+        self.publish_time = parse_time_of_day(publish_time)
+        self.prewarm_window = timedelta(hours=prewarm_hours)
+        self.prewarm_interval = prewarm_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.catch_up_window = timedelta(hours=catch_up_hours)
+        self.budget = budget if budget is not None else pipeline.DEFAULT_BUDGET
+        self.syllable_cache = SyllableCache(db.syllables)
+        self.state_path = data_dir + 'scheduler_state.json'
+        self._last_prewarm = None
+
+    def get_last_run_date(self):
+        """Get the date (as 'YYYY-MM-DD') of the last day a poem was made, or None."""
+        try:
+            with open(self.state_path, 'rb') as state_file:
+                return json.load(state_file).get('last_run')
+        except (IOError, ValueError):
+            return None
+
+    def set_last_run_date(self, date_string):
+        with open(self.state_path, 'wb') as state_file:
+            json.dump({'last_run': date_string}, state_file)
+
+    def get_next_publish(self, now):
+        """Get the next time a poem is due, which is in the past if today's poem is due but not made yet.
+
+        A poem missed by more than the catch up window is not made anymore.
+
+        Args:
+            now: The current datetime.
+        """
+        hour, minute = self.publish_time
+        publish = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if self.get_last_run_date() == publish.strftime('%Y-%m-%d') or now >= publish + self.catch_up_window:
+            publish += timedelta(days=1)
+        return publish
+
+    def prewarm(self):
+        """Fetch articles and resolve synonyms and syllables of as many keywords as the budget allows.
+
+        Failures are printed and otherwise ignored, as pre-warming is only an optimization. Pre-warming is skipped
+        while a poem is made by another process, see RunLock.
+        """
+        import pipeline
+
+        start_time = time.time()
+        try:
+            with RunLock(self.data_dir, blocking=False):
+                word_cloud = pipeline.build_word_cloud(self.budget.max_keywords)
+                pipeline.resolve_candidates(self.db, word_cloud, self.syllable_cache)
+                pipeline.save_state(self.data_dir)
+        except LockError:
+            print 'Pre-warming skipped, a poem is being made'
+            return
+        except Exception as e:
+            print '+++ Pre-warming failed: {0} +++'.format(e)
+        else:
+            print 'Pre-warmed {0} keywords in {1:.1f} s'.format(len(word_cloud), time.time() - start_time)
+
+    def run(self):
+        """Make a poem, retrying with increasing pauses if it fails.
+
+        Returns:
+            The _id of the poem, or None if no poem could be made.
+        """
+        import pipeline
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(self.retry_delay * 2 ** (attempt - 1), self.max_retry_delay)
+                print '+++ Retrying in {0} s. +++'.format(delay)
+                time.sleep(delay)
+            start_time = time.time()
+            poem_id = None
+            no_of_words = None
+            try:
+                with RunLock(self.data_dir):
+                    try:
+                        poem_id, no_of_words = pipeline.make_poem(self.db, self.scheme, self.budget,
+                                                                  self.syllable_cache)
+                    finally:
+                        pipeline.save_state(self.data_dir)
+            except Exception as e:
+                print '+++ Run failed: {0} +++'.format(e)
+            pipeline.append_log(self.data_dir, poem_id, no_of_words, time.time() - start_time)
+            if poem_id is not None:
+                return poem_id
+        return None
+
+    def tick(self, now):
+        """Do whatever is due at a time: pre-warming or making the poem.
+
+        Args:
+            now: The current datetime.
+        """
+        publish = self.get_next_publish(now)
+        if now >= publish:
+            self.run()
+            # do not retry for the rest of the day even if all retries failed, the next poem is due tomorrow
+            self.set_last_run_date(publish.strftime('%Y-%m-%d'))
+            self._last_prewarm = None
+        elif now >= publish - self.prewarm_window and \
+                (self._last_prewarm is None or time.time() - self._last_prewarm >= self.prewarm_interval):
+            self._last_prewarm = time.time()
+            self.prewarm()
+
+    def serve(self):
+        """Run the scheduler forever."""
+        print 'Scheduler started, next poem at {0}'.format(self.get_next_publish(datetime.now()))
+        while True:
+            self.tick(datetime.now())
+            time.sleep(TICK)
+
+
+def main():
+    data_dir = os.environ['OPENSHIFT_DATA_DIR']
+    try:
+        scheduler_lock = FileLock(data_dir + 'scheduler.lock', blocking=False)
+        scheduler_lock.acquire()
+    except LockError:
+        # scheduler is already running
+        return
+
+    import pipeline
+
+    from pymongo import MongoClient
+    from schemes import load_scheme, DEFAULT_SCHEME
+    from thesaurus import open_thesaurus
+
+    try:
+        locale.setlocale(locale.LC_ALL, 'de_DE.utf8')
+    except locale.Error:
+        print "Cannot set locale to de_DE.UTF-8"
+
+    client = MongoClient(os.environ['OPENSHIFT_MONGODB_DB_URL'])
+    db = client.tagespoet
+    pipeline.setup(data_dir, os.environ.get('TAGESPOET_FETCH_MODE', 'live'), os.environ.get('TAGESPOET_FETCH_ARCHIVE'),
+                   os.environ.get('TAGESPOET_SYLLABLES', 'auto'), open_thesaurus(data_dir, db),
+                   os.environ.get('TAGESPOET_SYNONYMS', 'offline'))
+
+    scheduler = Scheduler(db, data_dir, load_scheme(os.environ.get('TAGESPOET_SCHEME', DEFAULT_SCHEME)),
+                          os.environ.get('TAGESPOET_PUBLISH_TIME', DEFAULT_PUBLISH_TIME))
+    scheduler.serve()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing poem schemes, i.e. meters and rhyme schemes, loaded from data files.
+
+Schemes are JSON files in resources/schemes, for example:
+
+    {
+      "name": "trochaic_couplets",
+      "description": "Four lines of trochaic tetrameter in rhyming couplets, rhyming AABB.",
+      "lines": ["10101010", "10101010", "10101010", "10101010"],
+      "rhymes": "AABB"
+    }
+
+Each line is a string of stresses, 1 for a stressed and 0 for an unstressed syllable. Rhymes has one letter per line,
+lines with the same letter rhyme.
+
+A loaded scheme can check quickly whether a candidate pool might fill it at all, so that a pool that cannot is
+rejected without running the solver.
+"""
+
+import json
+import os
+
+from stress import StressIndex
+
+DEFAULT_SCHEME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'schemes')
+
+DEFAULT_SCHEME = 'dactyl'
+
+
+class PoemScheme(object):
+    """A meter and rhyme scheme for a poem.
+
+    Attributes:
+        name: Name of the scheme.
+        description: A short description of the scheme.
+        lines: A list of lines, each being a list of stresses, as used by solver.solve_poem.
+        rhyme_scheme: A list with the rhyme group (an int, starting at 1) of each line, as used by solver.solve_poem.
+    """
+
+    def __init__(self, name, lines, rhyme_scheme, description=''):
+        """
+        Args:
+            name: Name of the scheme.
+            lines: A list of lines, each being a list of stresses.
+            rhyme_scheme: A list with the rhyme group of each line.
+            description: A short description of the scheme.
+        """
+        self.name = name
+        self.description = description
+        self.lines = [list(line) for line in lines]
+        self.rhyme_scheme = list(rhyme_scheme)
+
+        # compiled form for find_infeasibility: distinct lines and, for each rhyme group, its no. of lines and the
+        # distinct lines it ends
+        self._shapes = sorted(set(tuple(line) for line in self.lines))
+        self._groups = {}
+        for line, group in zip(self.lines, self.rhyme_scheme):
+            size, shapes = self._groups.get(group, (0, set()))
+            shapes.add(tuple(line))
+            self._groups[group] = size + 1, shapes
+        self._no_of_syllables = sum(len(line) for line in self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def find_infeasibility(self, pool):
+        """Check necessary conditions for a candidate pool to fill the scheme.
+
+        The check runs in a few milliseconds. It does not prove that the pool can fill the scheme, but if it finds a
+        reason, the solver will not find a poem either.
+
+        Args:
+            pool: A solver.CandidatePool.
+
+        Returns:
+            A string describing why the pool cannot fill the scheme, or None if it might.
+        """
+        # every word is only used once
+        nxs = []
+        seen = set()
+        for nx, word in enumerate(pool.words):
+            if word not in seen:
+                seen.add(word)
+                nxs.append(nx)
+        if sum(len(pool.stresses[nx]) for nx in nxs) < self._no_of_syllables:
+            return 'not enough syllables'
+
+        # every line must be tileable with the stress patterns of the words, if each pattern could be used any
+        # no. of times
+        patterns = sorted(set(pool.stresses[nx] for nx in nxs))
+        stress_index = StressIndex(patterns)
+        end_patterns = {}
+        for shape in self._shapes:
+            fits = stress_index.fit_table(shape)
+            tileable = [True] + [False] * len(shape)
+            for pos in range(1, len(shape) + 1):
+                tileable[pos] = any(tileable[pos - len(patterns[pattern_nx])] for pattern_nx in fits[pos])
+            if not tileable[-1]:
+                return 'no words fit line ' + ''.join(str(stress) for stress in shape)
+            end_patterns[shape] = set(patterns[pattern_nx] for pattern_nx in fits[len(shape)]
+                                      if tileable[len(shape) - len(patterns[pattern_nx])])
+
+        # every rhyme group needs a rhyme class with enough words that can end its lines
+        for group, (size, shapes) in sorted(self._groups.iteritems()):
+            group_end_patterns = set().union(*[end_patterns[shape] for shape in shapes])
+            class_sizes = {}
+            for nx in nxs:
+                if pool.stresses[nx] in group_end_patterns:
+                    key = pool.rhymes.keys[nx]
+                    class_sizes[key] = class_sizes.get(key, 0) + 1
+            if max(class_sizes.values() or [0]) < size:
+                return 'not enough rhyming words for rhyme group {0}'.format(group)
+        return None
+
+    def check_feasible(self, pool):
+        """Check whether a candidate pool might fill the scheme, see find_infeasibility."""
+        return self.find_infeasibility(pool) is None
+
+
+def parse_scheme(data):
+    """Make a scheme from its JSON representation.
+
+    Args:
+        data: A dictionary as loaded from a scheme file.
+
+    Returns:
+        A PoemScheme.
+
+    Raises:
+        ValueError: The data is no valid scheme.
+    """
+    try:
+        name = data['name']
+        lines = data['lines']
+        rhymes = data['rhymes']
+    except KeyError as e:
+        raise ValueError('Scheme misses {0}'.format(e))
+    if not lines or len(rhymes) != len(lines):
+        raise ValueError('Scheme {0} needs one rhyme letter per line'.format(name))
+    if any(not line or line.strip('01') for line in lines):
+        raise ValueError('Scheme {0} has lines other than stresses 0 and 1'.format(name))
+
+    # number rhyme groups in order of their first line
+    groups = {}
+    for letter in rhymes:
+        groups.setdefault(letter, len(groups) + 1)
+    return PoemScheme(name, [[int(stress) for stress in line] for line in lines], [groups[letter] for letter in rhymes],
+                      data.get('description', ''))
+
+
+def load_scheme(name=DEFAULT_SCHEME, directory=DEFAULT_SCHEME_DIR):
+    """Load a scheme.
+
+    Args:
+        name: Name of the scheme, i.e. the name of its file in directory without '.json', or a path to a scheme file.
+        directory: Directory of the scheme files.
+
+    Returns:
+        A PoemScheme.
+
+    Raises:
+        IOError: There is no such scheme.
+        ValueError: The scheme file is no valid scheme.
+    """
+    path = name if name.endswith('.json') else os.path.join(directory, name + '.json')
+    with open(path, 'rb') as scheme_file:
+        return parse_scheme(json.load(scheme_file))
+
+
+def get_scheme_names(directory=DEFAULT_SCHEME_DIR):
+    """Get the names of all schemes in a directory."""
+    return sorted(filename[:-len('.json')] for filename in os.listdir(directory) if filename.endswith('.json'))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing functions for scoring poems, to pick the best of several candidate poems.
+
+A score function takes a solver.CandidatePool and a poem as returned by solver.solve_poem, i.e. a list of lines of
+indices of candidates, and returns a float where higher is better. The functions below score one aspect each, between
+0 and 1, and can be combined with make_score.
+"""
+
+from rhymes import loose_rhyme_key
+
+
+def keyword_coverage(pool, poem_lines):
+    """Score how many different keywords a poem is made of.
+
+    Returns:
+        The no. of keywords used, divided by the no. of keywords the poem could use at most. 0 if the keywords of the
+        candidates are unknown.
+    """
+    if pool.keyword_nxs is None:
+        return 0.0
+    nxs = [nx for line in poem_lines for nx in line]
+    used = len(set(pool.keyword_nxs[nx] for nx in nxs))
+    return float(used) / min(len(nxs), len(set(pool.keyword_nxs)))
+
+
+def keyword_frequency(pool, poem_lines):
+    """Score how important the keywords a poem is made of are, where keywords are ordered by importance.
+
+    Returns:
+        The mean over all words of the poem of 1 for the first keyword down to 0 for the last. 0 if the keywords of
+        the candidates are unknown.
+    """
+    if not pool.keyword_nxs:
+        return 0.0
+    no_of_keywords = max(pool.keyword_nxs) + 1
+    nxs = [nx for line in poem_lines for nx in line]
+    if no_of_keywords == 1:
+        return 1.0
+    return sum(1 - float(pool.keyword_nxs[nx]) / (no_of_keywords - 1) for nx in nxs) / len(nxs)
+
+
+def rhyme_variety(pool, poem_lines):
+    """Score how different the rhymes of a poem sound.
+
+    Rhyme groups whose line ends share vowel and end consonants (e.g. '-en') sound alike even if their last syllables
+    differ.
+
+    Returns:
+        The no. of different sounds of the line ends, divided by the no. of different rhyme classes of the line ends.
+    """
+    ends = [line[-1] for line in poem_lines]
+    sounds = set(loose_rhyme_key(pool.last_syls[nx]) for nx in ends)
+    return float(len(sounds)) / len(set(pool.rhymes.keys[nx] for nx in ends))
+
+
+DEFAULT_WEIGHTS = [(keyword_coverage, 1.0), (keyword_frequency, 0.5), (rhyme_variety, 0.5)]
+
+
+def make_score(weights):
+    """Make a score function summing up several score functions.
+
+    Args:
+        weights: A list of tuples of a score function and its weight.
+
+    Returns:
+        A score function.
+    """
+    def score(pool, poem_lines):
+        return sum(weight * func(pool, poem_lines) for func, weight in weights)
+    return score
+
+
+default_score = make_score(DEFAULT_WEIGHTS)
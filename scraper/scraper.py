@@ -4,28 +4,127 @@
 """
 
 import re
-import locale
-import codecs
-import os
-import sys
 
-import urllib
 from collections import Counter
+from itertools import chain
 from GermanStemmer2 import GermanStemmer2
-from bs4 import BeautifulSoup
+from lexicon import load_lexicon
+from extractors import extract_article_urls, extract_article_paragraphs
+from fetcher import fetch_url, map_concurrently, DEFAULT_MAX_WORKERS
+from telemetry import stage
+
+
+# capitalized words, i.e. nouns and words at the beginning of sentences
+# TODO: replace this with regex from different library in the future, such as https://pypi.python.org/pypi/regex
+NOUN_PATTERN = re.compile(u'[A-Z][A-Za-z0-9\\-äöüÄÖÜßèáàéôëêâîûùÿæçïœóåűúőíðþýøìõãòąćęłńśźżăşșţțğıčůďžěňřšťİ]+',
+                          re.UNICODE)
+
+# list forbidden words which are words that can be written capitalized at beginnings of sentences but are not nouns
+_forbidden_words = [u'ab', u'aber', u'abseits', u'abzüglich', u'als', u'am', u'an', u'anfangs', u'angesichts',
+                    u'anhand',
+                    u'anlässlich', u'ans', u'anstatt', u'anstelle', u'auf', u'aufgrund', u'aufs', u'aufseiten',
+                    u'aus',
+                    u'ausgangs', u'ausschließlich', u'ausweislich', u'außer', u'außerhalb', u'behufs', u'bei',
+                    u'beiderseits', u'beidseits', u'beim', u'betreffs', u'bevor', u'beziehungsweise', u'bezüglich',
+                    u'binnen', u'bis', u'contra', u'da', u'damit', u'dank', u'das', u'dass', u'dem', u'den', u'denn',
+                    u'der', u'des', u'dessen', u'desto', u'desungeachtet', u'die', u'diesseits', u'doch', u'du',
+                    u'durch', u'eh', u'ehe', u'ein', u'eine', u'einem', u'einen', u'einer', u'eines', u'eingangs',
+                    u'eingedenk', u'einschließlich', u'entgegen', u'entlang', u'entsprechend', u'entweder', u'er',
+                    u'es',
+                    u'exklusive', u'falls', u'fern', u'fernab', u'für', u'fürs', u'gegen', u'gegenüber',
+                    u'gelegentlich',
+                    u'gemäß', u'gen', u'geschweige', u'gleich', u'halber', u'hinsichtlich', u'hinter', u'hinterm',
+                    u'hinters', u'ich', u'ihr', u'im', u'in', u'indem', u'indes', u'indessen', u'infolge',
+                    u'inklusive',
+                    u'inmitten', u'innerhalb', u'innert', u'ins', u'insofern', u'insoweit', u'ist', u'je', u'jedoch',
+                    u'jenseits', u'kontra', u'kraft', u'lang', u'laut', u'links', u'längs', u'längsseits',
+                    u'mangels',
+                    u'maßen', u'minus', u'mit', u'mithilfe', u'mitsamt', u'mittels', u'nach', u'nachdem', u'nebst',
+                    u'nordwestlich', u'nordöstlich', u'nördlich', u'ob', u'oberhalb', u'obgleich', u'obschon',
+                    u'obwohl',
+                    u'obzwar', u'oder', u'ohne', u'per', u'plus', u'pro', u'rechts', u'respektive', u'samt', u'seit',
+                    u'seitens', u'seitlich', u'seitwärts', u'sie', u'so', u'sobald', u'sodass', u'sofern', u'solang',
+                    u'solange', u'sondern', u'sooft', u'soviel', u'soweit', u'sowie', u'sowohl', u'statt',
+                    u'südlich',
+                    u'südwestlich', u'südöstlich', u'trotz', u'trotzdem', u'um', u'ums', u'umso', u'unbeschadet',
+                    u'und',
+                    u'unerachtet', u'unfern', u'ungeachtet', u'unter', u'unterhalb', u'unterm', u'untern', u'unters',
+                    u'unweit', u'vermittels', u'vermittelst', u'vermöge', u'via', u'vom', u'von', u'vonseiten',
+                    u'vor',
+                    u'vorbehaltlich', u'weder', u'wegen', u'weil', u'wenn', u'wennauch', u'wenngleich', u'wennschon',
+                    u'wider', u'wie', u'wiewohl', u'wir', u'wo', u'wobei', u'wofern', u'wohingegen', u'während',
+                    u'währenddem', u'währenddessen', u'zeit', u'zu', u'zufolge', u'zugunsten', u'zulieb', u'zuliebe',
+                    u'zum', u'zumal', u'zur', u'zuungunsten', u'zuwider', u'zuzüglich', u'zwecks', u'zwischen',
+                    u'östlich', u'über', u'überm', u'übern', u'übers', u'auch']
+FORBIDDEN_WORDS = frozenset(word.title() for word in _forbidden_words)
+
+# word stemmer, shared between calls so that its cache of stemmed words is kept
+stemmer = GermanStemmer2()
+
+
+def get_article_sentences(article_url):
+    """Get the paragraphs of an article on Tagesschau.de
+
+    Author lines (such as 'Von Max Mustermann, ARD-Hauptstadtstudio') are left out.
 
+    Args:
+        article_url: Absolute URL of the article.
+
+    Returns:
+        A list of unicode strings, one for each paragraph of the article.
+    """
+    sentences = []
+    for paragraph_text in extract_article_paragraphs(fetch_url(article_url)):
+        stripped_word = paragraph_text.strip().split()
+        ignore = 0
+        if len(stripped_word) > 0 \
+                and stripped_word[0] == 'Von' \
+                and ',' in paragraph_text \
+                and len(stripped_word) < 8:
+            ignore = 1
+        if not ignore:
+            sentences.append(paragraph_text)
+    return sentences
+
+
+def iter_nouns(paragraphs):
+    """Get all nouns (capitalized words) from paragraphs of text.
+
+    Words that can be capitalized at the beginning of a sentence but are not nouns (see FORBIDDEN_WORDS) are left out.
+
+    Args:
+        paragraphs: An iterable of unicode strings.
+
+    Returns:
+        A generator of unicode strings, one for each occurrence of a noun.
+    """
+    find_nouns = NOUN_PATTERN.findall
+    for paragraph in paragraphs:
+        for noun in find_nouns(paragraph):
+            if noun not in FORBIDDEN_WORDS:
+                yield noun
+
+
+def count_nouns(paragraphs):
+    """Count the occurrences of nouns in paragraphs of text.
+
+    Args:
+        paragraphs: An iterable of unicode strings.
 
-try:
-    locale.setlocale(locale.LC_ALL, 'de_DE.UTF-8')
-except locale.Error:
-    print "Cannot set locale to de_DE.UTF-8"
+    Returns:
+        A collections.Counter mapping nouns to their no. of occurrences.
+    """
+    return Counter(iter_nouns(paragraphs))
 
 
-def get_tagesschau_words(no_of_words):
+def get_tagesschau_words(no_of_words, max_workers=DEFAULT_MAX_WORKERS):
     """Get most occuring nouns from articles on main site of Tagesschau.de [tag]
 
+    The articles are downloaded and parsed concurrently.
+
     Args:
         no_of_words: No. of words to get
+        max_workers: Maximum no. of articles fetched at the same time. With 1, articles are fetched one after another.
 
     Returns:
         A list of strings of the nouns occurring most in the articles on the main site
@@ -35,117 +134,31 @@ def get_tagesschau_words(no_of_words):
     """
 
     # import dictionary for lemmatization
-    de_dictionary = codecs.open(os.path.dirname(__file__) + '/resources/de-lexicon.txt', encoding='utf-8').read()
-
-    article_urls = []
+    de_lexicon = load_lexicon()
 
     # get URLs of main articles on tagesschau.de
-    r = urllib.urlopen('http://www.tagesschau.de/').read()
-    site_text = BeautifulSoup(r, "html.parser")
-    for links in site_text.find_all('a', attrs={'class': None}):
-        dachzeilen = len(links.find_all('p', attrs={'class': 'dachzeile'}))
-        headlines = len(links.find_all('h4', attrs={'class': 'headline'}))
-        teasertexts = len(links.find_all('p', attrs={'class': 'teasertext'}))
-        if dachzeilen and headlines and teasertexts:
-            link_target = links['href']
-            if link_target[0] == '/':
-                article_urls.append('http://www.tagesschau.de' + links['href'])
-    # print article_urls
-
-    # get all text from articles
-    all_sentences = []
-    for article_url in article_urls:
-        # print article_url
-        r = urllib.urlopen(article_url).read()
-        article = BeautifulSoup(r, "html.parser")
-        for text_div in article.find_all('div', attrs={'class': 'mod modA modParagraph'}):
-            for paragraph in text_div.find_all('p', attrs={'class': 'text small'}):
-                paragraph_text = paragraph.getText()
-                stripped_word = paragraph_text.strip().split()
-                ignore = 0
-                if len(stripped_word) > 0 \
-                        and stripped_word[0] == 'Von' \
-                        and ',' in paragraph_text \
-                        and len(stripped_word) < 8:
-                    ignore = 1
-                if not ignore:
-                    all_sentences.append(paragraph_text.encode('utf-8'))
-
-    # Get all nouns or capitalized words
-    all_nouns = []
-    for sentence in all_sentences:
-        # TODO: replace this with regex from different library in the future, such as https://pypi.python.org/pypi/regex
-        nouns = re.compile('([A-Z][A-Za-z0-9\-äöüÄÖÜßèáàéôëêâîûùÿæçïœóåűúőíðþýøìõãòąćęłńśźżăşșţțğıčůďžěňřšťİ]+)',
-                           re.UNICODE).findall(sentence)
-        for noun in nouns:
-            try:
-                all_nouns.append(noun.decode('utf-8'))
-            except UnicodeEncodeError:
-                print 'UnicodeEncodeError detected. The following word contains an unknown letter:'
-                print noun
-
-    # filter
-
-    # list forbidden words which are words that can be written capitalized at beginnings of sentences but are not nouns
-    forbidden_words = [u'ab', u'aber', u'abseits', u'abzüglich', u'als', u'am', u'an', u'anfangs', u'angesichts',
-                       u'anhand',
-                       u'anlässlich', u'ans', u'anstatt', u'anstelle', u'auf', u'aufgrund', u'aufs', u'aufseiten',
-                       u'aus',
-                       u'ausgangs', u'ausschließlich', u'ausweislich', u'außer', u'außerhalb', u'behufs', u'bei',
-                       u'beiderseits', u'beidseits', u'beim', u'betreffs', u'bevor', u'beziehungsweise', u'bezüglich',
-                       u'binnen', u'bis', u'contra', u'da', u'damit', u'dank', u'das', u'dass', u'dem', u'den', u'denn',
-                       u'der', u'des', u'dessen', u'desto', u'desungeachtet', u'die', u'diesseits', u'doch', u'du',
-                       u'durch', u'eh', u'ehe', u'ein', u'eine', u'einem', u'einen', u'einer', u'eines', u'eingangs',
-                       u'eingedenk', u'einschließlich', u'entgegen', u'entlang', u'entsprechend', u'entweder', u'er',
-                       u'es',
-                       u'exklusive', u'falls', u'fern', u'fernab', u'für', u'fürs', u'gegen', u'gegenüber',
-                       u'gelegentlich',
-                       u'gemäß', u'gen', u'geschweige', u'gleich', u'halber', u'hinsichtlich', u'hinter', u'hinterm',
-                       u'hinters', u'ich', u'ihr', u'im', u'in', u'indem', u'indes', u'indessen', u'infolge',
-                       u'inklusive',
-                       u'inmitten', u'innerhalb', u'innert', u'ins', u'insofern', u'insoweit', u'ist', u'je', u'jedoch',
-                       u'jenseits', u'kontra', u'kraft', u'lang', u'laut', u'links', u'längs', u'längsseits',
-                       u'mangels',
-                       u'maßen', u'minus', u'mit', u'mithilfe', u'mitsamt', u'mittels', u'nach', u'nachdem', u'nebst',
-                       u'nordwestlich', u'nordöstlich', u'nördlich', u'ob', u'oberhalb', u'obgleich', u'obschon',
-                       u'obwohl',
-                       u'obzwar', u'oder', u'ohne', u'per', u'plus', u'pro', u'rechts', u'respektive', u'samt', u'seit',
-                       u'seitens', u'seitlich', u'seitwärts', u'sie', u'so', u'sobald', u'sodass', u'sofern', u'solang',
-                       u'solange', u'sondern', u'sooft', u'soviel', u'soweit', u'sowie', u'sowohl', u'statt',
-                       u'südlich',
-                       u'südwestlich', u'südöstlich', u'trotz', u'trotzdem', u'um', u'ums', u'umso', u'unbeschadet',
-                       u'und',
-                       u'unerachtet', u'unfern', u'ungeachtet', u'unter', u'unterhalb', u'unterm', u'untern', u'unters',
-                       u'unweit', u'vermittels', u'vermittelst', u'vermöge', u'via', u'vom', u'von', u'vonseiten',
-                       u'vor',
-                       u'vorbehaltlich', u'weder', u'wegen', u'weil', u'wenn', u'wennauch', u'wenngleich', u'wennschon',
-                       u'wider', u'wie', u'wiewohl', u'wir', u'wo', u'wobei', u'wofern', u'wohingegen', u'während',
-                       u'währenddem', u'währenddessen', u'zeit', u'zu', u'zufolge', u'zugunsten', u'zulieb', u'zuliebe',
-                       u'zum', u'zumal', u'zur', u'zuungunsten', u'zuwider', u'zuzüglich', u'zwecks', u'zwischen',
-                       u'östlich', u'über', u'überm', u'übern', u'übers', u'auch']
-
-    # filter out forbidden words
-    for nx, word in enumerate(forbidden_words):
-        sys.stdout.write(forbidden_words[nx].title())
-        forbidden_words[nx] = forbidden_words[nx].title()
-
-    # sort words by occurrence
-    news_words = Counter([item for item in all_nouns if item not in forbidden_words])
-    news_words = [item[0] for item in news_words.most_common(no_of_words)]
-
-    # filter out known nouns
-    final_words = []
-    stemmer = GermanStemmer2()
-    for word in news_words:
-        if word not in de_dictionary:
-            if word.isupper():
-                # do not consider abbreviations (all uppercase)
-                final_words.append(word)
-            else:
-                # stem word with word stemmer
-                final_words.append(stemmer.stem(word.encode('iso-8859-1')).decode('iso-8859-1').title())
-        else:
-            final_words.append(word)
+    with stage('front_page_fetch') as timing:
+        article_urls = extract_article_urls(fetch_url('http://www.tagesschau.de/'))
+        timing.count = len(article_urls)
+
+    # get all text from articles, keeping the order of the articles on the main site
+    with stage('article_fetches') as timing:
+        article_sentences = map_concurrently(get_article_sentences, article_urls, max_workers)
+        timing.count = len(article_urls)
+
+    # get all nouns or capitalized words, sorted by occurrence
+    with stage('noun_extraction') as timing:
+        news_words = count_nouns(chain.from_iterable(article_sentences))
+        timing.count = len(news_words)
+        news_words = [item[0] for item in news_words.most_common(no_of_words)]
+
+    # filter out known nouns and stem the others with word stemmer,
+    # do not consider abbreviations (all uppercase)
+    with stage('stemming') as timing:
+        unknown_words = [word for word in news_words if word not in de_lexicon and not word.isupper()]
+        stems = dict(zip(unknown_words, stemmer.stem_many(unknown_words)))
+        final_words = [stems[word].title() if word in stems else word for word in news_words]
+        timing.count = len(unknown_words)
 
     # make words unique
     seen = set()
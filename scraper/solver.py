@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing a solver that fits words into a poem scheme.
+
+A poem scheme is a list of lines, each being a list of syllables where 1 is a stressed and 0 is an unstressed
+syllable. A rhyme scheme assigns a rhyme group to every line, lines in the same group must end with rhyming words.
+
+The solver does not try words one by one. Words with the same stress pattern are interchangeable inside a line, and
+words with the same stress pattern and rhyme class (see rhymes.py) are interchangeable at the end of a line. So the
+solver searches over stress patterns and counts of words left for each pattern, which is a much smaller search space:
+
+1. Rhymes: for every rhyme group, pick a rhyme class and, for every line of the group, the stress pattern of the
+   word ending the line.
+2. Lines: fill the rest of every line with stress patterns, using no pattern more often than there are words left.
+
+Both steps are depth-first searches with backtracking. Dead ends are remembered by the counts of words left, so no
+state is searched twice. The search is complete: it either finds a poem or proves that the candidates cannot fill the
+scheme. Finally, actual words are drawn at random for the chosen patterns.
+
+The search can be limited by a SolverBudget. If the budget runs out, the solver returns the most lines it managed to
+fill. SolverStats tell where the search spent its time.
+"""
+
+import random
+import time
+
+from rhymes import RhymeIndex, exact_rhyme_key
+from stress import StressIndex
+
+
+class CandidatePool(object):
+    """Candidate words for a poem.
+
+    Attributes:
+        words: A list of unicode strings.
+        stresses: A list with a tuple of stresses (1 for stressed, 0 for unstressed syllable) for each word.
+        last_syls: A list with the last syllable of each word, without stress characters.
+        rhymes: A rhymes.RhymeIndex of the words.
+        keyword_nxs: A list with the index of the keyword each word is a synonym of, or None if unknown.
+    """
+
+    def __init__(self, words, stresses, last_syls, rhyme_key=exact_rhyme_key, keyword_nxs=None):
+        """
+        Args:
+            words: A list of unicode strings.
+            stresses: A list with a list of stresses for each word.
+            last_syls: A list with the last syllable of each word, without stress characters.
+            rhyme_key: A function mapping a last syllable to its rhyme key, e.g. rhymes.loose_rhyme_key to let more
+                words rhyme.
+            keyword_nxs: An optional list with the index of the keyword each word is a synonym of, where keywords are
+                ordered by importance. Used for scoring poems.
+        """
+        self.words = words
+        self.stresses = [tuple(stress) for stress in stresses]
+        self.last_syls = last_syls
+        self.rhymes = RhymeIndex(last_syls, rhyme_key)
+        self.keyword_nxs = keyword_nxs
+
+    def __len__(self):
+        return len(self.words)
+
+
+class SolverBudget(object):
+    """Limits for making a poem.
+
+    Attributes:
+        max_time: Maximum no. of seconds a single solver may search, or None for no limit.
+        max_iterations: Maximum no. of draws (see SolverStats) of a single solver, or None for no limit.
+        min_keywords: No. of keywords the first attempt to make a poem starts with.
+        max_keywords: Maximum no. of keywords, no further attempt is made beyond this.
+        keyword_step: No. of keywords added for the next attempt if a poem cannot be made.
+    """
+
+    def __init__(self, max_time=None, max_iterations=None, min_keywords=20, max_keywords=35, keyword_step=5):
+        self.max_time = max_time
+        self.max_iterations = max_iterations
+        self.min_keywords = min_keywords
+        self.max_keywords = max_keywords
+        self.keyword_step = keyword_step
+
+    def get_keyword_counts(self):
+        """Get the no. of keywords of each attempt to make a poem, i.e. the escalation steps."""
+        return range(self.min_keywords, self.max_keywords + 1, self.keyword_step)
+
+
+class SolverStats(object):
+    """Counters of a solver run.
+
+    Attributes:
+        draws: No. of rhyme classes and stress patterns tried.
+        rejections: A dictionary with the no. of stress patterns and rhyme classes not tried, by reason: 'length' (too
+            many syllables for the rest of the line), 'stress' (stresses do not fit), 'rhyme' (not in the rhyme class
+            of the line, or too few words in the rhyme class) and 'duplicate' (all words with the pattern used).
+        prunings: No. of times a search branch was cut off because a line could no longer be filled or the branch
+            was already known to fail.
+        resets: No. of times a tried pattern or rhyme class was taken back.
+        rhyme_time: Seconds spent picking rhyme classes and line ends.
+        line_times: A list with the seconds spent filling each line.
+        total_time: Seconds of the whole run.
+    """
+
+    def __init__(self, no_of_lines):
+        self.draws = 0
+        self.rejections = {'length': 0, 'stress': 0, 'rhyme': 0, 'duplicate': 0}
+        self.prunings = 0
+        self.resets = 0
+        self.rhyme_time = 0.0
+        self.line_times = [0.0] * no_of_lines
+        self.total_time = 0.0
+
+    def as_dict(self):
+        """Get the counters as a dictionary."""
+        return {'draws': self.draws, 'rejections': dict(self.rejections), 'prunings': self.prunings,
+                'resets': self.resets, 'rhyme_time': self.rhyme_time, 'line_times': list(self.line_times),
+                'total_time': self.total_time}
+
+
+class SolverResult(object):
+    """Result of a solver run.
+
+    Attributes:
+        lines: A list of lines, each being a list of indices of candidates in the pool. If the poem is not complete,
+            these are the first lines of the poem the solver managed to fill, possibly none.
+        complete: True if lines is a complete poem.
+        exhausted: True if the budget ran out before the search finished.
+        stats: The SolverStats of the run.
+    """
+
+    def __init__(self, lines, complete, exhausted, stats):
+        self.lines = lines
+        self.complete = complete
+        self.exhausted = exhausted
+        self.stats = stats
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+class PoemSolver(object):
+    """Solver fitting candidate words into a poem scheme and a rhyme scheme.
+
+    No word is used twice in a poem, and all lines of a rhyme group end with words of the same rhyme class. A word
+    found more than once in the pool (e.g. as a synonym of several keywords) is expected to have the same stresses and
+    last syllable every time, only its first occurrence is used.
+    """
+
+    def __init__(self, pool, poem_scheme, rhyme_scheme, seed=None, budget=None):
+        """
+        Args:
+            pool: A CandidatePool.
+            poem_scheme: A list of lines, each being a list of stresses.
+            rhyme_scheme: A list with the rhyme group (an int) of each line.
+            seed: Seed for the order in which patterns are tried and words are drawn. Different seeds give different
+                poems.
+            budget: An optional SolverBudget limiting the search.
+        """
+        self.pool = pool
+        self.lines = [tuple(line) for line in poem_scheme]
+        self.rhyme_scheme = list(rhyme_scheme)
+        self.random = random.Random(seed)
+        self.budget = budget or SolverBudget()
+
+        # candidates by stress pattern and rhyme class, every word is only taken once
+        first_nxs = set()
+        seen = set()
+        for nx, word in enumerate(pool.words):
+            if word not in seen:
+                seen.add(word)
+                first_nxs.add(nx)
+        self._by_type = {}
+        for rhyme in pool.rhymes.get_classes():
+            for nx in pool.rhymes.get_ids(rhyme):
+                if nx in first_nxs:
+                    self._by_type.setdefault((pool.stresses[nx], rhyme), []).append(nx)
+
+        self._patterns = sorted(set(pattern for pattern, _ in self._by_type))
+        self._pattern_counts = dict((pattern, 0) for pattern in self._patterns)
+        # no. of words per rhyme class and stress pattern
+        self._rhyme_counts = {}
+        for (pattern, rhyme), nxs in self._by_type.iteritems():
+            self._pattern_counts[pattern] += len(nxs)
+            self._rhyme_counts.setdefault(rhyme, {})[pattern] = len(nxs)
+        self._rhymes = sorted(self._rhyme_counts)
+
+        # rhyme groups in order of their first line
+        self._groups = []
+        for line_nx, group in enumerate(self.rhyme_scheme):
+            if group not in self._groups:
+                self._groups.append(group)
+        self._group_lines = dict((group, [line_nx for line_nx, line_group in enumerate(self.rhyme_scheme)
+                                          if line_group == group]) for group in self._groups)
+
+        # for every line and position in the line, the stress patterns that fit in front of the position
+        stress_index = StressIndex(self._patterns)
+        self._fits = [[[self._patterns[pattern_nx] for pattern_nx in pattern_nxs]
+                       for pattern_nxs in stress_index.fit_table(line)] for line in self.lines]
+        # for every no. of syllables, the no. of patterns that are longer
+        max_len = max(len(line) for line in self.lines) if self.lines else 0
+        self._longer = [sum(1 for pattern in self._patterns if len(pattern) > end) for end in range(max_len + 1)]
+
+    def run(self):
+        """Search for a poem within the budget.
+
+        Returns:
+            A SolverResult. If the pool cannot fill the poem scheme, the result is neither complete nor exhausted.
+        """
+        self.stats = SolverStats(len(self.lines))
+        self._line_rhymes = [None] * len(self.lines)
+        self._line_ends = [None] * len(self.lines)
+        self._line_patterns = [None] * len(self.lines)
+        self._failed_rhymes = set()
+        self._failed_lines = set()
+        self._best = None
+        self._start_time = time.time()
+        self._stage = None
+        self._stage_start = self._start_time
+        counts = dict(self._pattern_counts)
+        rhyme_counts = dict((rhyme, dict(pattern_counts)) for rhyme, pattern_counts in self._rhyme_counts.iteritems())
+
+        exhausted = False
+        try:
+            complete = self._place_rhymes(0, counts, rhyme_counts)
+        except _BudgetExhausted:
+            complete = False
+            exhausted = True
+        self._enter_stage(None)
+        self.stats.total_time = time.time() - self._start_time
+
+        if complete:
+            lines = self._draw_words(self._line_rhymes, self._line_ends, self._line_patterns)
+        elif self._best is not None:
+            lines = self._draw_words(*self._best)
+        else:
+            lines = []
+        return SolverResult(lines, complete, exhausted, self.stats)
+
+    def solve(self):
+        """Search for a poem.
+
+        Returns:
+            A list of lines, each being a list of indices of candidates in the pool, or None if the pool cannot fill
+            the poem scheme or the budget ran out.
+        """
+        result = self.run()
+        return result.lines if result.complete else None
+
+    def _draw(self):
+        """Count a draw and stop the search if the budget ran out."""
+        self.stats.draws += 1
+        budget = self.budget
+        if budget.max_iterations is not None and self.stats.draws > budget.max_iterations:
+            raise _BudgetExhausted()
+        if budget.max_time is not None and not self.stats.draws % 64 \
+                and time.time() - self._start_time > budget.max_time:
+            raise _BudgetExhausted()
+
+    def _enter_stage(self, stage):
+        """Add the time since the last change of stage to the current stage, then change to another stage.
+
+        Args:
+            stage: Index of the line being filled, or None while picking rhyme classes and line ends.
+        """
+        now = time.time()
+        if self._stage is None:
+            self.stats.rhyme_time += now - self._stage_start
+        else:
+            self.stats.line_times[self._stage] += now - self._stage_start
+        self._stage = stage
+        self._stage_start = now
+
+    def _counts_key(self, counts):
+        return tuple(counts[pattern] for pattern in self._patterns)
+
+    def _place_rhymes(self, group_nx, counts, rhyme_counts):
+        """Pick the rhyme class and the patterns of the line ends of a rhyme group and all groups after it."""
+        if group_nx == len(self._groups):
+            # dead ends of filling lines only hold for the line ends picked
+            self._failed_lines = set()
+            found = self._fill_line(0, counts)
+            self._enter_stage(None)
+            return found
+
+        # the groups after this one only depend on the words left and the lengths of the line ends picked so far
+        state = (group_nx, tuple(sorted((rhyme, self._counts_key_sparse(pattern_counts))
+                                        for rhyme, pattern_counts in rhyme_counts.iteritems())),
+                 tuple(len(end) if end else 0 for end in self._line_ends))
+        if state in self._failed_rhymes:
+            self.stats.prunings += 1
+            return False
+
+        line_nxs = self._group_lines[self._groups[group_nx]]
+        rhymes = [rhyme for rhyme in self._rhymes if sum(rhyme_counts[rhyme].itervalues()) >= len(line_nxs)]
+        self.stats.rejections['rhyme'] += len(self._rhymes) - len(rhymes)
+        self.random.shuffle(rhymes)
+        tried = set()
+        for rhyme in rhymes:
+            # rhymes with the same words left per pattern are interchangeable
+            profile = self._counts_key_sparse(rhyme_counts[rhyme])
+            if profile in tried:
+                continue
+            tried.add(profile)
+            self._draw()
+            if self._place_line_ends(line_nxs, 0, rhyme, group_nx, counts, rhyme_counts):
+                return True
+            self.stats.resets += 1
+
+        self._failed_rhymes.add(state)
+        return False
+
+    @staticmethod
+    def _counts_key_sparse(pattern_counts):
+        return tuple(sorted((pattern, count) for pattern, count in pattern_counts.iteritems() if count))
+
+    def _place_line_ends(self, line_nxs, nx, rhyme, group_nx, counts, rhyme_counts):
+        """Pick the pattern of the word ending each line of a rhyme group, then continue with the next group."""
+        if nx == len(line_nxs):
+            return self._place_rhymes(group_nx + 1, counts, rhyme_counts)
+
+        line_nx = line_nxs[nx]
+        line_len = len(self.lines[line_nx])
+        fits = self._fits[line_nx][line_len]
+        patterns = [pattern for pattern in fits if rhyme_counts[rhyme].get(pattern)]
+        left = sum(1 for pattern in fits if counts[pattern])
+        self._count_rejections(line_len, fits, left, len(patterns))
+        self.random.shuffle(patterns)
+        for pattern in patterns:
+            self._draw()
+            counts[pattern] -= 1
+            rhyme_counts[rhyme][pattern] -= 1
+            if self._fillable(line_nx, line_len - len(pattern), counts):
+                self._line_rhymes[line_nx] = rhyme
+                self._line_ends[line_nx] = pattern
+                if self._place_line_ends(line_nxs, nx + 1, rhyme, group_nx, counts, rhyme_counts):
+                    return True
+                self._line_rhymes[line_nx] = None
+                self._line_ends[line_nx] = None
+                self.stats.resets += 1
+            else:
+                self.stats.prunings += 1
+            counts[pattern] += 1
+            rhyme_counts[rhyme][pattern] += 1
+        return False
+
+    def _count_rejections(self, end, fits, left, rhyming):
+        """Count the patterns not tried for a position in a line by reason.
+
+        Args:
+            end: No. of syllables left in the line.
+            fits: The patterns fitting in front of the position.
+            left: No. of fitting patterns with words left.
+            rhyming: No. of fitting patterns with words left in the rhyme class of the line.
+        """
+        rejections = self.stats.rejections
+        rejections['length'] += self._longer[end]
+        rejections['stress'] += len(self._patterns) - self._longer[end] - len(fits)
+        rejections['duplicate'] += len(fits) - left
+        rejections['rhyme'] += left - rhyming
+
+    def _fillable(self, line_nx, end, counts):
+        """Check whether the syllables of a line in front of a position can be filled with the words left, if each
+        line could use all words left."""
+        fits = self._fits[line_nx]
+        fillable = [True] + [False] * end
+        for pos in range(1, end + 1):
+            for pattern in fits[pos]:
+                if counts[pattern] and fillable[pos - len(pattern)]:
+                    fillable[pos] = True
+                    break
+        return fillable[end]
+
+    def _fill_line(self, line_nx, counts):
+        """Fill the syllables in front of the line end of a line and all lines after it with patterns."""
+        if self._best is None or line_nx > len(self._best[2]):
+            # most lines filled so far, kept in case the budget runs out
+            self._best = list(self._line_rhymes), list(self._line_ends), self._line_patterns[:line_nx]
+        if line_nx == len(self.lines):
+            return True
+
+        # the lines after this one only depend on the words left
+        state = (line_nx, self._counts_key(counts))
+        if state in self._failed_lines:
+            self.stats.prunings += 1
+            return False
+
+        self._enter_stage(line_nx)
+        if self._fill_syllables(line_nx, len(self.lines[line_nx]) - len(self._line_ends[line_nx]), counts, []):
+            return True
+        self._failed_lines.add(state)
+        return False
+
+    def _fill_syllables(self, line_nx, end, counts, line_patterns):
+        """Fill the syllables of a line in front of a position with patterns, from the back, then continue with the
+        next line.
+
+        Args:
+            line_nx: Index of the line.
+            end: No. of syllables still to fill, at the beginning of the line.
+            counts: A dictionary with the no. of words left for each pattern.
+            line_patterns: The patterns placed in the line so far, from the end of the line.
+        """
+        if not end:
+            self._line_patterns[line_nx] = line_patterns[::-1]
+            found = self._fill_line(line_nx + 1, counts)
+            if not found:
+                self._line_patterns[line_nx] = None
+                self._enter_stage(line_nx)
+            return found
+
+        fits = self._fits[line_nx][end]
+        patterns = [pattern for pattern in fits if counts[pattern]]
+        self._count_rejections(end, fits, len(patterns), len(patterns))
+        self.random.shuffle(patterns)
+        for pattern in patterns:
+            self._draw()
+            rest = end - len(pattern)
+            counts[pattern] -= 1
+            line_patterns.append(pattern)
+            if not self._fillable(line_nx, rest, counts):
+                self.stats.prunings += 1
+            elif self._fill_syllables(line_nx, rest, counts, line_patterns):
+                return True
+            else:
+                self.stats.resets += 1
+            line_patterns.pop()
+            counts[pattern] += 1
+        return False
+
+    def _draw_words(self, line_rhymes, line_ends, line_patterns):
+        """Draw words at random for the patterns picked by the search.
+
+        Args:
+            line_rhymes: A list with the rhyme class of each line.
+            line_ends: A list with the pattern ending each line.
+            line_patterns: A list with the patterns in front of the line end of each line filled, for the first lines
+                of the poem.
+        """
+        by_type = dict((word_type, list(nxs)) for word_type, nxs in self._by_type.iteritems())
+        for nxs in by_type.itervalues():
+            self.random.shuffle(nxs)
+
+        # words ending lines first, as they also need a specific rhyme class
+        ends = [by_type[(line_ends[line_nx], line_rhymes[line_nx])].pop() for line_nx in range(len(line_patterns))]
+
+        by_pattern = {}
+        for (pattern, _), nxs in by_type.iteritems():
+            by_pattern.setdefault(pattern, []).extend(nxs)
+        for nxs in by_pattern.itervalues():
+            self.random.shuffle(nxs)
+
+        return [[by_pattern[pattern].pop() for pattern in line_patterns[line_nx]] + [ends[line_nx]]
+                for line_nx in range(len(line_patterns))]
+
+
+def solve_poem(pool, poem_scheme, rhyme_scheme, seed=None, budget=None):
+    """Fit candidate words into a poem scheme and a rhyme scheme.
+
+    Args:
+        pool: A CandidatePool.
+        poem_scheme: A list of lines, each being a list of stresses.
+        rhyme_scheme: A list with the rhyme group (an int) of each line.
+        seed: Seed for the order in which patterns are tried and words are drawn.
+        budget: An optional SolverBudget limiting the search.
+
+    Returns:
+        A list of lines, each being a list of indices of candidates in the pool, or None if the pool cannot fill the
+        poem scheme or the budget ran out.
+    """
+    return PoemSolver(pool, poem_scheme, rhyme_scheme, seed, budget).solve()
+
+
+def run_solver(pool, poem_scheme, rhyme_scheme, seed=None, budget=None):
+    """Fit candidate words into a poem scheme and a rhyme scheme, keeping the best partial poem and the counters of
+    the search.
+
+    Args:
+        pool: A CandidatePool.
+        poem_scheme: A list of lines, each being a list of stresses.
+        rhyme_scheme: A list with the rhyme group (an int) of each line.
+        seed: Seed for the order in which patterns are tried and words are drawn.
+        budget: An optional SolverBudget limiting the search.
+
+    Returns:
+        A SolverResult.
+    """
+    return PoemSolver(pool, poem_scheme, rhyme_scheme, seed, budget).run()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing stress patterns encoded as bitmasks.
+
+A stress pattern, e.g. [1, 0, 0] for a dactyl, is encoded as an integer whose binary digits are the stresses, read
+from the first to the last syllable (0b100 = 4), together with its length. Patterns of many candidates are kept in
+arrays, so the candidates fitting a position in a line are found with one vectorized operation instead of comparing
+lists for one candidate after another. NumPy is used if it is installed.
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def encode_pattern(stresses):
+    """Encode a stress pattern as a bitmask.
+
+    Args:
+        stresses: A sequence of stresses (1 for stressed, 0 for unstressed syllable).
+
+    Returns:
+        An int whose binary digits are the stresses.
+    """
+    mask = 0
+    for stress in stresses:
+        mask = (mask << 1) | (1 if stress else 0)
+    return mask
+
+
+class StressIndex(object):
+    """Stress patterns of candidates in array-backed storage.
+
+    Attributes:
+        masks: An array with the bitmask of each pattern.
+        lengths: An array with the no. of syllables of each pattern.
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: A list of stress patterns.
+        """
+        self.masks = array('l', [encode_pattern(pattern) for pattern in patterns])
+        self.lengths = array('l', [len(pattern) for pattern in patterns])
+        if numpy is not None:
+            self._masks = numpy.array(self.masks, dtype=numpy.int64)
+            self._lengths = numpy.array(self.lengths, dtype=numpy.int64)
+            self._length_masks = (1 << self._lengths) - 1
+
+    def __len__(self):
+        return len(self.masks)
+
+    def fit_at(self, line, end):
+        """Get the patterns that fit into a line, ending at a position.
+
+        Args:
+            line: A sequence of stresses.
+            end: Position in the line after the last syllable of the pattern, between 0 and the length of the line.
+
+        Returns:
+            A list of indices of the patterns whose stresses equal those of the syllables in front of end.
+        """
+        line_mask = encode_pattern(line[:end])
+        if numpy is not None:
+            fits = (self._lengths <= end) & ((line_mask & self._length_masks) == self._masks)
+            return numpy.flatnonzero(fits).tolist()
+        masks = self.masks
+        return [nx for nx, length in enumerate(self.lengths)
+                if length <= end and line_mask & ((1 << length) - 1) == masks[nx]]
+
+    def fit_table(self, line):
+        """Get the patterns that fit into a line at each position.
+
+        Args:
+            line: A sequence of stresses.
+
+        Returns:
+            A list with a list of indices of patterns (see fit_at) for each end position from 0 to the length of the
+            line.
+        """
+        return [self.fit_at(line, end) for end in range(len(line) + 1)]
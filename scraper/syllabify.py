@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing an offline engine for syllables and stresses of German words.
+
+Words are split into syllables with Liang's hyphenation patterns (as used by TeX), by default the German patterns of
+the hyph-utf8 project bundled in resources/hyph-de.pat, or with rules for German orthographic syllables if no pattern
+file is available. Then the
+stressed syllable is picked by rules for German: stressed foreign suffixes (e.g. '-ion', '-ität', '-ieren'),
+unstressed prefixes (e.g. 'be-', 'ver-') and stress on the first syllable otherwise. As in lookup.get_syllable, a
+final syllable 'on' after 'i' and a consonant is joined with the syllable before (e.g. 'Lek-tion').
+
+Only words the rules are reliable for are marked as confident: words stressed on the first syllable, without
+letters or endings of loanwords (e.g. 'y', '-ik', '-ur', or '-a' after more than two syllables as in 'Europa'),
+without stressed suffixes after the first syllable, hidden in inflected forms or compounds (e.g. 'Regierungen',
+'Finanzminister'), and without adjacent vowels in separate syllables (e.g. 'Theater'). Without hyphenation patterns,
+words with clusters of three or more consonants between vowels are uncertain as well, as the rules cannot tell where
+compounds are joined (e.g. 'Ab-stim-mung'). All other words, including abbreviations, are marked as uncertain, so
+that their syllables can be looked up remotely instead.
+
+The engine is only used by default once it agrees with the syllables looked up remotely before: run as a script to
+compare the engine with the syllables stored in the database, which records the result in the data directory (see
+is_validated):
+
+    python syllabify.py --validate [--patterns PATH]
+"""
+
+import argparse
+import codecs
+import json
+import os
+import re
+import unicodedata
+
+from datetime import datetime
+
+DEFAULT_PATTERN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'hyph-de.pat')
+
+# version of the rules, increase when splitting, stress or confidence rules change, so that the engine is validated
+# again
+ENGINE_VERSION = 2
+
+# name of the result of the last validation in the data directory, see is_validated
+VALIDATION_NAME = 'syllable_validation.json'
+
+# no. of confident words a validation must cover, and share of them with the same syllables and stresses as looked up
+# remotely, for the engine to be used by default
+MIN_VALIDATED_WORDS = 1000
+MIN_AGREEMENT = 0.97
+
+vowels = frozenset(u'aeiouyäöü')
+
+# vowel pairs forming a single syllable nucleus
+diphthongs = frozenset([u'ai', u'au', u'äu', u'ei', u'eu', u'ie', u'aa', u'ee', u'oo', u'ey', u'ay'])
+
+# consonant letter groups that are not split between syllables, longest first
+consonant_graphemes = [u'sch', u'ch', u'ck', u'ph', u'th', u'qu']
+
+# consonant pairs starting a syllable together, e.g. 'De-mo-kra-tie'
+liquid_onsets = frozenset([u'bl', u'br', u'dr', u'fl', u'fr', u'gl', u'gr', u'kl', u'kr', u'pl', u'pr', u'tr'])
+
+# prefixes after which a consonant pair is split, e.g. 'Auf-ruf', 'Ab-lauf'
+consonant_prefixes = frozenset([u'ab', u'auf', u'ob', u'aus', u'ein', u'vor', u'her', u'hin', u'dar', u'zer'])
+
+# prefixes never carrying the stress
+unstressed_prefixes = [u'be', u'ge', u'er', u'ver', u'zer', u'ent', u'emp']
+
+# suffixes carrying the stress, with the position of their stressed vowel, longest first
+stressed_suffixes = sorted([(u'ion', 1), (u'ität', 2), (u'ieren', 0), (u'ierung', 0), (u'iert', 0), (u'ierte', 0),
+                            (u'ier', 0), (u'ie', 0), (u'ismus', 0), (u'ist', 0), (u'ei', 0), (u'erei', 2), (u'ur', 0),
+                            (u'ant', 0), (u'anz', 0), (u'ent', 0), (u'enz', 0), (u'ell', 0), (u'ös', 0), (u'eur', 0),
+                            (u'ette', 0), (u'ett', 0), (u'ade', 0), (u'age', 0), (u'ine', 0), (u'ee', 0)],
+                           key=lambda suffix: -len(suffix[0]))
+
+# letter sequences hinting at loanwords whose syllables and stresses do not follow German rules
+foreign_pattern = re.compile(u'y|c(?![hk])|ou|eau|oi|[^a-zäöüß]', re.UNICODE)
+
+# endings of loanwords, which are often not stressed on the first syllable, e.g. 'Politik', 'Kredit', 'Europa'
+loanword_endings = (u'a', u'i', u'o', u'u', u'um', u'us', u'ik', u'or', u'al', u'ar', u'at', u'on', u'ent', u'ant',
+                    u'ist', u'ur', u'ie', u'ee', u'ät')
+
+# loanword endings of words with two syllables, which are stressed on the first syllable, e.g. 'Klima', 'Taxi', 'Datum'
+two_syllable_endings = (u'a', u'i', u'um', u'us')
+
+# '-it' after a consonant, e.g. 'Kredit', but not 'Arbeit'
+_consonant_it_pattern = re.compile(u'[^aeiouyäöü]it$', re.UNICODE)
+
+# stressed suffixes and loanword endings that may be followed by inflections or further words of a compound, e.g.
+# 'Regierungen', 'Finanzminister', 'Ministerium'; harmless in the first syllable, e.g. 'Kanzlerin'
+stressed_infix_pattern = re.compile(u'ier|ion|ität|ik|anz|enz|ism|ium|eum|ur|ell|ett', re.UNICODE)
+
+# clusters of three or more consonants between vowels, after joining consonant graphemes, e.g. 'Abstimmung'
+_vowel_class = u'[' + u''.join(sorted(vowels)) + u']'
+long_cluster_pattern = re.compile(_vowel_class + u'[^' + u''.join(sorted(vowels)) + u']{3,}' + _vowel_class,
+                                  re.UNICODE)
+
+
+class PatternTrie(object):
+    """Liang hyphenation patterns in a compact trie.
+
+    The trie is stored as a dictionary from each pattern's letters to its points, plus the set of all prefixes of
+    patterns, so that a walk through the trie is a series of set lookups.
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: An iterable of patterns like u'.ab1s' or u'a1b', where '.' marks the beginning or end of a word
+                and digits are the points between letters.
+        """
+        self._points = {}
+        self._prefixes = set()
+        for pattern in patterns:
+            letters = u''.join(char for char in pattern if not char.isdigit())
+            points = [0] * (len(letters) + 1)
+            pos = 0
+            for char in pattern:
+                if char.isdigit():
+                    points[pos] = int(char)
+                else:
+                    pos += 1
+            self._points[letters] = tuple(points)
+            for end in range(1, len(letters) + 1):
+                self._prefixes.add(letters[:end])
+
+    def __len__(self):
+        return len(self._points)
+
+    def get_breaks(self, word):
+        """Get the positions where a word can be split.
+
+        Args:
+            word: A unicode string in lower case.
+
+        Returns:
+            A list of positions in the word, each at the start of a syllable except the first.
+        """
+        text = u'.' + word + u'.'
+        points = [0] * (len(text) + 1)
+        for start in range(len(text)):
+            for end in range(start + 1, len(text) + 1):
+                letters = text[start:end]
+                if letters not in self._prefixes:
+                    break
+                pattern_points = self._points.get(letters)
+                if pattern_points is not None:
+                    for nx, point in enumerate(pattern_points):
+                        if point > points[start + nx]:
+                            points[start + nx] = point
+        # points[nx + 1] is the point in front of letter nx of the word
+        return [nx for nx in range(1, len(word)) if points[nx + 1] % 2]
+
+
+def load_patterns(path):
+    """Load Liang hyphenation patterns from a file.
+
+    Args:
+        path: Path of a UTF-8 file with patterns separated by whitespace, optionally wrapped in TeX's \\patterns{...}.
+            Comments start with '%'. Hyphenation exceptions (\\hyphenation{...}) are ignored.
+
+    Returns:
+        A PatternTrie.
+    """
+    patterns = []
+    in_exceptions = False
+    with codecs.open(path, 'r', 'utf-8') as pattern_file:
+        for line in pattern_file:
+            line = line.split(u'%', 1)[0]
+            for token in line.split():
+                if token.startswith(u'\\hyphenation'):
+                    in_exceptions = True
+                elif token.startswith(u'\\patterns'):
+                    in_exceptions = False
+                elif token == u'}':
+                    in_exceptions = False
+                elif not in_exceptions:
+                    token = token.strip(u'{}')
+                    if token:
+                        patterns.append(unicodedata.normalize('NFC', token))
+    return PatternTrie(patterns)
+
+
+def _onset_length(cluster, before):
+    """Get the no. of letters at the end of a consonant cluster that start the next syllable.
+
+    Args:
+        cluster: The consonants between two syllable nuclei.
+        before: The part of the word before the cluster.
+    """
+    for grapheme in consonant_graphemes:
+        if cluster.endswith(grapheme):
+            return len(grapheme)
+    if cluster[-2:] in liquid_onsets and before + cluster[:-1] not in consonant_prefixes:
+        return 2
+    return 1
+
+
+def _get_rule_breaks(word):
+    """Get the positions where a word in lower case is split into syllables, by rules."""
+    nuclei = []
+    nx = 0
+    while nx < len(word):
+        char = word[nx]
+        if char in vowels and not (char == u'u' and nx > 0 and word[nx - 1] == u'q'):
+            end = nx + 2 if word[nx:nx + 2] in diphthongs else nx + 1
+            nuclei.append((nx, end))
+            nx = end
+        else:
+            nx += 1
+
+    breaks = []
+    for (_, end), (start, _) in zip(nuclei, nuclei[1:]):
+        cluster = word[end:start]
+        breaks.append(start - _onset_length(cluster, word[:end]) if cluster else start)
+    return breaks
+
+
+class Syllabifier(object):
+    """Engine splitting German words into syllables and assigning stresses."""
+
+    def __init__(self, patterns=None):
+        """
+        Args:
+            patterns: An optional PatternTrie. Without patterns, words are split by rules.
+        """
+        self.patterns = patterns
+
+    def split(self, word):
+        """Split a word into syllables.
+
+        Args:
+            word: A unicode string.
+
+        Returns:
+            A list of syllables, or None if the word has no vowel.
+        """
+        word = unicodedata.normalize('NFC', word)
+        lower = word.lower()
+        if not any(char in vowels for char in lower):
+            return None
+        breaks = self.patterns.get_breaks(lower) if self.patterns is not None else _get_rule_breaks(lower)
+        syls = [word[start:end] for start, end in zip([0] + breaks, breaks + [len(word)])]
+
+        # every syllable needs a vowel
+        merged = []
+        for syl in syls:
+            if merged and not any(char in vowels for char in syl.lower()):
+                merged[-1] += syl
+            elif merged and not any(char in vowels for char in merged[-1].lower()):
+                merged[-1] += syl
+            else:
+                merged.append(syl)
+        syls = merged
+
+        # special case 'Lektion, Region,...', as in lookup.get_syllable
+        if len(syls) > 2 and syls[-1].lower() == u'on' and syls[-2][-1].lower() == u'i' \
+                and len(syls[-2]) > 1 and syls[-2][-2].lower() not in vowels:
+            last_syl = syls.pop()
+            syls[-1] += last_syl
+        return syls
+
+    @staticmethod
+    def get_stresses(syls):
+        """Assign stresses to the syllables of a word.
+
+        Args:
+            syls: A list of syllables.
+
+        Returns:
+            A list with 1 for the stressed syllable and 0 for all others.
+        """
+        stresses = [0] * len(syls)
+        if len(syls) == 1:
+            stresses[0] = 1
+            return stresses
+        lower = u''.join(syls).lower()
+        starts = []
+        pos = 0
+        for syl in syls:
+            starts.append(pos)
+            pos += len(syl)
+
+        stressed = 0
+        for suffix, vowel_nx in stressed_suffixes:
+            if lower.endswith(suffix) and len(lower) > len(suffix):
+                vowel_pos = len(lower) - len(suffix) + vowel_nx
+                stressed = max(nx for nx, start in enumerate(starts) if start <= vowel_pos)
+                break
+        else:
+            if syls[0].lower() in unstressed_prefixes:
+                stressed = 1
+        stresses[stressed] = 1
+        return stresses
+
+    def analyze(self, word):
+        """Get syllables and stresses of a word.
+
+        Args:
+            word: A unicode string.
+
+        Returns:
+            A tuple of syllables, stresses and whether the word follows the rules of the engine. Syllables and
+            stresses are None if the word cannot be split.
+        """
+        syls = self.split(word)
+        if syls is None:
+            return None, None, False
+        stresses = self.get_stresses(syls)
+        return syls, stresses, _is_confident(word, syls, stresses, self.patterns is not None)
+
+
+def _has_hiatus(lower):
+    """Check whether a word in lower case has adjacent vowels that are not a diphthong, e.g. 'theater'.
+
+    A vowel after a diphthong, e.g. 'mauer', or 'u' after 'q' does not count.
+    """
+    nx = 0
+    while nx < len(lower) - 1:
+        if lower[nx:nx + 2] in diphthongs:
+            nx += 2
+            continue
+        if lower[nx] in vowels and lower[nx + 1] in vowels \
+                and not (lower[nx] == u'u' and nx > 0 and lower[nx - 1] == u'q'):
+            return True
+        nx += 1
+    return False
+
+
+def _has_loanword_ending(lower, no_of_syls):
+    if no_of_syls == 2 and lower.endswith(two_syllable_endings):
+        return False
+    return lower.endswith(loanword_endings) or bool(_consonant_it_pattern.search(lower))
+
+
+def _is_confident(word, syls, stresses, has_patterns=True):
+    """Check whether the syllables and stresses of a word follow the rules of the engine, see the module docstring.
+
+    Args:
+        word: The word.
+        syls: Its syllables.
+        stresses: Its stresses.
+        has_patterns: Whether the syllables were split with hyphenation patterns instead of rules.
+    """
+    if len(word) > 1 and word.isupper():
+        # abbreviation
+        return False
+    if len(syls) > 1 and stresses[0] != 1:
+        return False
+    lower = unicodedata.normalize('NFC', word).lower()
+    if foreign_pattern.search(lower) or _has_hiatus(lower):
+        return False
+    if len(syls) == 1:
+        return True
+    if _has_loanword_ending(lower, len(syls)):
+        return False
+    # stressed suffixes hidden after the first syllable
+    if stressed_infix_pattern.search(lower, len(syls[0])):
+        return False
+    if has_patterns:
+        return True
+    joined = lower
+    for grapheme in consonant_graphemes:
+        joined = joined.replace(grapheme, u'x')
+    return not long_cluster_pattern.search(joined)
+
+
+def load_syllabifier(pattern_path=DEFAULT_PATTERN_PATH):
+    """Make a syllabifier, using hyphenation patterns if the pattern file exists.
+
+    Args:
+        pattern_path: Path of a pattern file, see load_patterns.
+
+    Returns:
+        A Syllabifier.
+    """
+    if pattern_path and os.path.exists(pattern_path):
+        return Syllabifier(load_patterns(pattern_path))
+    return Syllabifier()
+
+
+def compare_with_subwords(syllabifier, subwords):
+    """Compare the syllabifier with syllables looked up before.
+
+    Args:
+        syllabifier: A Syllabifier.
+        subwords: An iterable of subwords as stored in the database (see lookup.make_subword), i.e. dictionaries with
+            'word', 'syls' and 'stresses'.
+
+    Returns:
+        A dictionary with the no. of words compared ('words'), words the syllabifier is confident about ('confident')
+        and, among those, words with the same syllables ('same_syls'), the same stresses ('same_stresses'), the same
+        last syllable ('same_last_syl'), and a list of up to 20 examples of differences ('examples').
+    """
+    from lookup import substitute_all_by_empty, stress_chars
+
+    counts = {'words': 0, 'confident': 0, 'same': 0, 'same_syls': 0, 'same_stresses': 0, 'same_last_syl': 0,
+              'examples': []}
+    for subword in subwords:
+        counts['words'] += 1
+        syls, stresses, confident = syllabifier.analyze(subword['word'])
+        if not confident:
+            continue
+        counts['confident'] += 1
+        expected_syls = [substitute_all_by_empty(syl, stress_chars) for syl in subword['syls']]
+        same_syls = [syl.lower() for syl in syls] == [syl.lower() for syl in expected_syls]
+        same_stresses = stresses == list(subword['stresses'])
+        counts['same_syls'] += same_syls
+        counts['same_stresses'] += same_stresses
+        counts['same_last_syl'] += syls[-1].lower() == expected_syls[-1].lower()
+        counts['same'] += same_syls and same_stresses
+        if not (same_syls and same_stresses) and len(counts['examples']) < 20:
+            counts['examples'].append((subword['word'], syls, stresses, expected_syls, list(subword['stresses'])))
+    return counts
+
+
+def get_engine_id(syllabifier):
+    """Get an identifier of the rules and patterns of a syllabifier, which a validation applies to."""
+    return '{0}-{1}'.format(ENGINE_VERSION, len(syllabifier.patterns) if syllabifier.patterns is not None else 0)
+
+
+def save_validation(path, syllabifier, counts):
+    """Record the result of a validation, see compare_with_subwords and is_validated."""
+    with open(path, 'wb') as validation_file:
+        json.dump({'engine': get_engine_id(syllabifier), 'date': datetime.utcnow().isoformat(),
+                   'words': counts['words'], 'confident': counts['confident'], 'same': counts['same']},
+                  validation_file, sort_keys=True)
+
+
+def is_validated(path, syllabifier, min_words=MIN_VALIDATED_WORDS, min_agreement=MIN_AGREEMENT):
+    """Check whether a syllabifier passed its last validation.
+
+    Args:
+        path: Path of the recorded validation, see save_validation.
+        syllabifier: A Syllabifier.
+        min_words: No. of confident words the validation must cover.
+        min_agreement: Share of confident words with the same syllables and stresses as looked up remotely.
+
+    Returns:
+        True if a validation of the same rules and patterns was recorded and passed, otherwise False.
+    """
+    try:
+        with open(path, 'rb') as validation_file:
+            validation = json.load(validation_file)
+    except (IOError, ValueError):
+        return False
+    if validation.get('engine') != get_engine_id(syllabifier) or validation.get('confident', 0) < min_words:
+        return False
+    return float(validation.get('same', 0)) / validation['confident'] >= min_agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline German syllabification and stress engine.')
+    parser.add_argument('--validate', action='store_true',
+                        help='compare the engine with the syllables stored in the database')
+    parser.add_argument('--patterns', default=DEFAULT_PATTERN_PATH, help='path of a hyphenation pattern file')
+    parser.add_argument('words', nargs='*', help='words to analyze')
+    args = parser.parse_args()
+
+    syllabifier = load_syllabifier(args.patterns)
+    print 'Using {0}'.format('{0} hyphenation patterns'.format(len(syllabifier.patterns))
+                             if syllabifier.patterns is not None else 'rules')
+    for word in args.words:
+        syls, stresses, confident = syllabifier.analyze(word.decode('utf-8'))
+        print u'{0}: {1} {2}{3}'.format(word.decode('utf-8'), u'-'.join(syls or []), stresses,
+                                        u'' if confident else u' (uncertain)').encode('utf-8')
+
+    if args.validate:
+        from pymongo import MongoClient
+
+        db = MongoClient(os.environ['OPENSHIFT_MONGODB_DB_URL']).tagespoet
+        subwords = (subword for doc in db.synonyms.find({'subword': {'$exists': True}}, {'subword': 1})
+                    for subword in doc['subword'])
+        counts = compare_with_subwords(syllabifier, subwords)
+        confident = counts['confident'] or 1
+        print 'Words: {0}, confident: {1}'.format(counts['words'], counts['confident'])
+        print 'Same syllables: {0:.1%}, same stresses: {1:.1%}, same last syllable: {2:.1%}, same both: {3:.1%}'.format(
+            float(counts['same_syls']) / confident, float(counts['same_stresses']) / confident,
+            float(counts['same_last_syl']) / confident, float(counts['same']) / confident)
+        validation_path = os.environ['OPENSHIFT_DATA_DIR'] + VALIDATION_NAME
+        save_validation(validation_path, syllabifier, counts)
+        if is_validated(validation_path, syllabifier):
+            print 'Passed: the engine is used by default (syllable mode \'auto\')'
+        else:
+            print 'Not passed: at least {0} confident words with {1:.0%} the same syllables and stresses needed'.format(
+                MIN_VALIDATED_WORDS, MIN_AGREEMENT)
+        for word, syls, stresses, expected_syls, expected_stresses in counts['examples']:
+            print u'{0}: {1} {2}, expected {3} {4}'.format(word, u'-'.join(syls), stresses, u'-'.join(expected_syls),
+                                                          expected_stresses).encode('utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing a cache for syllables and stresses of words, stored in MongoDB.
+
+The cache holds the result of get_syllable for every word looked up, independent of the keyword the word was found as
+a synonym for. Words whose syllables cannot be identified are cached as well, so they are not looked up again on every
+run. As the lookup page may learn such words later, these negative results expire after some time.
+"""
+
+import unicodedata
+
+from datetime import datetime, timedelta
+
+# time after which a word whose syllables could not be identified is looked up again
+DEFAULT_NEGATIVE_TTL = timedelta(days=30)
+
+
+def normalize_word(word):
+    """Get the key of a word in the cache.
+
+    Args:
+        word: A unicode string.
+
+    Returns:
+        The word without surrounding whitespace, in Unicode normal form C.
+    """
+    return unicodedata.normalize('NFC', word.strip())
+
+
+class SyllableCache(object):
+    """A cache of the results of lookup.get_syllable, stored in a MongoDB collection.
+
+    Each document has the normalized word as _id, the syllables ('syls') and stresses ('stresses') or None for both if
+    syllables could not be identified, and the date of the lookup ('date').
+    """
+
+    def __init__(self, collection, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        """
+        Args:
+            collection: A pymongo collection.
+            negative_ttl: A timedelta after which negative results expire.
+        """
+        self.collection = collection
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, words):
+        """Get cached results for several words with a single query.
+
+        Args:
+            words: A list of unicode strings.
+
+        Returns:
+            A dictionary mapping each word found in the cache to its result as returned by get_syllable, i.e. a tuple
+            of syllables and stresses, or (0, 0) if syllables could not be identified. Words not in the cache, or with
+            an expired negative result, are left out.
+        """
+        keys = dict((word, normalize_word(word)) for word in words)
+        docs = {}
+        for doc in self.collection.find({'_id': {'$in': list(set(keys.values()))}}):
+            docs[doc['_id']] = doc
+        negative_since = datetime.utcnow() - self.negative_ttl
+
+        results = {}
+        for word in words:
+            doc = docs.get(keys[word])
+            if doc is None or (doc['syls'] is None and doc['date'] < negative_since):
+                self.misses += 1
+            else:
+                self.hits += 1
+                if doc['syls'] is None:
+                    results[word] = 0, 0
+                else:
+                    results[word] = doc['syls'], doc['stresses']
+        return results
+
+    def put_many(self, results):
+        """Store results for several words with a single bulk write.
+
+        Args:
+            results: A dictionary mapping words to results as returned by get_syllable.
+        """
+        if not results:
+            return
+        now = datetime.utcnow()
+        bulk = self.collection.initialize_unordered_bulk_op()
+        for word, (syls, stresses) in results.iteritems():
+            if syls == 0 or stresses == 0:
+                syls, stresses = None, None
+            key = normalize_word(word)
+            bulk.find({'_id': key}).upsert().replace_one({'_id': key, 'syls': syls, 'stresses': stresses, 'date': now})
+        bulk.execute()
+
+    def get_hit_rate(self):
+        """Get the share of words found in the cache, between 0 and 1."""
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
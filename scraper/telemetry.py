@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing the telemetry of runs making a poem: time and counts of each stage, written as JSON lines.
+
+Stages are timed with stage(), which adds to the telemetry of the current run (see start_run) and does nothing if no
+run is started, e.g. if a stage is called on its own. When a run is finished, its telemetry is appended to the log set
+with set_log_path as one line of JSON.
+
+Run as a script to summarize the runs in a log, comparing recent runs with earlier ones:
+
+    python telemetry.py [--recent N] [--threshold FACTOR] [PATH]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from datetime import datetime
+
+# name of the log in the data directory
+DEFAULT_LOG_NAME = 'telemetry.jsonl'
+
+# no. of runs compared with the runs before them by the report
+DEFAULT_RECENT_RUNS = 7
+
+# factor by which a stage must have slowed down to be reported as a regression
+DEFAULT_REGRESSION_THRESHOLD = 1.5
+
+# seconds by which a stage must have slowed down at least to be reported as a regression, ignoring noise of fast stages
+MIN_REGRESSION_SECONDS = 0.1
+
+# telemetry of the current run, see start_run
+_current = None
+
+# path of the log runs are appended to, see set_log_path
+_log_path = None
+
+
+class StageTiming(object):
+    """Time and count of one call of a stage, see stage()."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        # no. of items the stage processed, e.g. articles fetched, if set by the stage
+        self.count = None
+
+
+class RunTelemetry(object):
+    """Telemetry of one run: totals of each stage and further values like cache hit rates."""
+
+    def __init__(self):
+        self.started = datetime.utcnow()
+        self.stages = {}
+        self.values = {}
+        self._start_time = time.time()
+        # stages may run in several threads, e.g. lookups
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds, count=None):
+        """Add a call of a stage.
+
+        Args:
+            name: Name of the stage.
+            seconds: Wall time of the call.
+            count: No. of items processed by the call, or None.
+        """
+        with self._lock:
+            totals = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'count': 0})
+            totals['seconds'] += seconds
+            totals['calls'] += 1
+            if count is not None:
+                totals['count'] += count
+
+    def set_value(self, name, value):
+        with self._lock:
+            self.values[name] = value
+
+    def as_dict(self):
+        """Get the telemetry as a dictionary that can be written as JSON."""
+        with self._lock:
+            run = dict(self.values)
+            run['date'] = self.started.isoformat()
+            run['seconds'] = time.time() - self._start_time
+            run['stages'] = dict((name, dict(totals)) for name, totals in self.stages.iteritems())
+        return run
+
+
+def set_log_path(path):
+    """Set the log finished runs are appended to.
+
+    Args:
+        path: Path of the log, or None to not write runs.
+    """
+    global _log_path
+    _log_path = path
+
+
+def start_run():
+    """Start the telemetry of a new run, replacing the current one.
+
+    Returns:
+        The RunTelemetry.
+    """
+    global _current
+    _current = RunTelemetry()
+    return _current
+
+
+def finish_run(**values):
+    """Finish the current run and append it to the log.
+
+    Args:
+        values: Further values of the run, e.g. its status.
+
+    Returns:
+        The run as a dictionary, or None if no run is started.
+    """
+    global _current
+    run_telemetry, _current = _current, None
+    if run_telemetry is None:
+        return None
+    run = run_telemetry.as_dict()
+    run.update(values)
+    if _log_path is not None:
+        with open(_log_path, 'a') as log_file:
+            log_file.write(json.dumps(run, sort_keys=True) + '\n')
+    return run
+
+
+def record(name, value):
+    """Set a value of the current run, if a run is started."""
+    run_telemetry = _current
+    if run_telemetry is not None:
+        run_telemetry.set_value(name, value)
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current run.
+
+    The stage is added to the current run even if it raises an exception. Set the count of the yielded StageTiming to
+    the no. of items processed.
+
+    Args:
+        name: Name of the stage.
+    """
+    timing = StageTiming()
+    start_time = time.time()
+    try:
+        yield timing
+    finally:
+        timing.seconds = time.time() - start_time
+        run_telemetry = _current
+        if run_telemetry is not None:
+            run_telemetry.add_stage(name, timing.seconds, timing.count)
+
+
+def get_hit_counts(cache):
+    """Get the counters of a cache with hits and misses (and optionally revalidations), e.g. a httpcache.HTTPCache.
+
+    Returns:
+        A dictionary of the counters, empty if the cache is None.
+    """
+    if cache is None:
+        return {}
+    counts = {'hits': cache.hits, 'misses': cache.misses}
+    if hasattr(cache, 'revalidations'):
+        counts['revalidations'] = cache.revalidations
+    return counts
+
+
+def diff_hit_counts(before, after):
+    """Get the counters of a cache during a run, with its hit rate.
+
+    Revalidated pages count as hits, as they were not fetched again.
+
+    Args:
+        before: Counters at the start of the run, see get_hit_counts.
+        after: Counters at the end of the run.
+
+    Returns:
+        A dictionary of the counters and 'hit_rate', which is None if the cache was not used.
+    """
+    counts = dict((name, after[name] - before.get(name, 0)) for name in after)
+    hits = counts.get('hits', 0) + counts.get('revalidations', 0)
+    total = hits + counts.get('misses', 0)
+    counts['hit_rate'] = float(hits) / total if total else None
+    return counts
+
+
+def load_runs(path):
+    """Load the runs of a log, skipping lines that cannot be read, e.g. of a run interrupted while writing.
+
+    Returns:
+        A list of dictionaries, oldest first.
+    """
+    runs = []
+    with open(path, 'rb') as log_file:
+        for line in log_file:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return runs
+
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def summarize(runs, recent=DEFAULT_RECENT_RUNS, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Summarize runs, comparing the most recent ones with the runs before them.
+
+    Args:
+        runs: A list of runs, oldest first, see load_runs.
+        recent: No. of most recent runs compared with the runs before them.
+        threshold: Factor by which the median time of a stage must have grown to count as a regression, see also
+            MIN_REGRESSION_SECONDS.
+
+    Returns:
+        A dictionary with the no. of runs ('runs') and successful runs ('ok') among the recent ones, the median of
+        the run time, escalation rounds and cache hit rates of recent and earlier runs ('totals'), and for each stage
+        the median time of recent and earlier runs, the median count of recent runs and whether the stage regressed
+        ('stages').
+    """
+    recent_runs = runs[-recent:]
+    earlier_runs = runs[:-recent]
+
+    def get_medians(get_value):
+        medians = []
+        for selected_runs in (recent_runs, earlier_runs):
+            values = [get_value(run) for run in selected_runs]
+            medians.append(_median([value for value in values if value is not None]))
+        return medians
+
+    totals = {
+        'seconds': get_medians(lambda run: run.get('seconds')),
+        'escalation_rounds': get_medians(lambda run: run.get('escalation_rounds')),
+    }
+    for cache_name in sorted(set(name for run in runs for name in run.get('caches', {}))):
+        totals[cache_name + '_hit_rate'] = get_medians(
+            lambda run: run.get('caches', {}).get(cache_name, {}).get('hit_rate'))
+
+    stages = {}
+    for name in sorted(set(name for run in runs for name in run.get('stages', {}))):
+        recent_seconds, earlier_seconds = get_medians(lambda run: run.get('stages', {}).get(name, {}).get('seconds'))
+        recent_count, _ = get_medians(lambda run: run.get('stages', {}).get(name, {}).get('count'))
+        stages[name] = {
+            'recent': recent_seconds,
+            'earlier': earlier_seconds,
+            'count': recent_count,
+            'regressed': bool(recent_seconds is not None and earlier_seconds
+                              and recent_seconds > threshold * earlier_seconds
+                              and recent_seconds - earlier_seconds >= MIN_REGRESSION_SECONDS)
+        }
+
+    return {'runs': len(recent_runs), 'ok': sum(1 for run in recent_runs if run.get('status') == 'ok'),
+            'totals': totals, 'stages': stages}
+
+
+def _format_value(value, format_string='{0:.2f}'):
+    return format_string.format(value) if value is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the telemetry of poem runs.')
+    parser.add_argument('path', nargs='?', help='path of the log, by default ' + DEFAULT_LOG_NAME +
+                                                ' in the data directory')
+    parser.add_argument('--recent', type=int, default=DEFAULT_RECENT_RUNS,
+                        help='no. of recent runs compared with the runs before them')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='factor by which a stage must have slowed down to be reported')
+    args = parser.parse_args()
+
+    path = args.path or os.environ['OPENSHIFT_DATA_DIR'] + DEFAULT_LOG_NAME
+    summary = summarize(load_runs(path), args.recent, args.threshold)
+    print 'Last {0} runs: {1} ok'.format(summary['runs'], summary['ok'])
+    print ''
+    print '{0:<24} {1:>10} {2:>10}'.format('', 'recent', 'earlier')
+    for name, (recent_value, earlier_value) in sorted(summary['totals'].iteritems()):
+        print '{0:<24} {1:>10} {2:>10}'.format(name, _format_value(recent_value), _format_value(earlier_value))
+    print ''
+    print '{0:<24} {1:>10} {2:>10} {3:>10}'.format('stage (median s)', 'recent', 'earlier', 'count')
+    for name, medians in sorted(summary['stages'].iteritems()):
+        print '{0:<24} {1:>10} {2:>10} {3:>10}{4}'.format(
+            name, _format_value(medians['recent'], '{0:.3f}'), _format_value(medians['earlier'], '{0:.3f}'),
+            _format_value(medians['count'], '{0:.0f}'), '  +++ slower +++' if medians['regressed'] else '')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Module containing a local thesaurus, imported from a dump of OpenThesaurus [ot].
+
+The dump is the plain text export of OpenThesaurus, with one group of synonyms (a synset) per line, separated by
+semicolons, e.g. 'Regierung;Kabinett;Staatsführung'. Lines starting with '#' are comments. Annotations in
+parentheses, like '(ugs.)', are removed, and terms consisting of more than one word are left out, as they cannot be
+fitted into a poem.
+
+The dump is imported in a single streaming pass, either into a pickled index in the data directory (FileThesaurus)
+or into a MongoDB collection with an index on its terms (MongoThesaurus). Both look up the synonyms of many words at
+once with get_many.
+
+Run as a script to import a dump:
+
+    python thesaurus.py openthesaurus.txt [--mongo]
+
+.. [ot] https://www.openthesaurus.de/about/download
+"""
+
+import argparse
+import codecs
+import cPickle as pickle
+import os
+import re
+import time
+import unicodedata
+
+# name of the pickled index in the data directory
+INDEX_NAME = 'thesaurus.pickle'
+
+# version of the pickled index format, increase when the format changes
+INDEX_VERSION = 1
+
+# no. of synsets written to MongoDB at once
+DEFAULT_BATCH_SIZE = 1000
+
+_annotation_pattern = re.compile(u'\\([^)]*\\)', re.UNICODE)
+
+
+def parse_thesaurus(lines):
+    """Parse the lines of an OpenThesaurus text dump.
+
+    Args:
+        lines: An iterable of unicode strings, e.g. a file opened with codecs.
+
+    Returns:
+        A generator of synsets, each being a tuple of at least one distinct term, in the order of the dump.
+    """
+    for line in lines:
+        if line.startswith(u'#'):
+            continue
+        synset = []
+        for term in line.split(u';'):
+            term = unicodedata.normalize('NFC', _annotation_pattern.sub(u'', term).strip())
+            if term and u' ' not in term and term not in synset:
+                synset.append(term)
+        if synset:
+            yield tuple(synset)
+
+
+def _collect_synonyms(word, synsets):
+    """Get the distinct synonyms of a word from the synsets containing it, leaving out the word itself."""
+    synonyms = []
+    seen = set([word])
+    for synset in synsets:
+        for term in synset:
+            if term not in seen:
+                seen.add(term)
+                synonyms.append(term)
+    return synonyms
+
+
+class FileThesaurus(object):
+    """A thesaurus held in memory, stored as a pickled index.
+
+    The index maps each term to the numbers of the synsets containing it.
+    """
+
+    def __init__(self):
+        self.synsets = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def add_synsets(self, synsets):
+        for synset in synsets:
+            synset_no = len(self.synsets)
+            self.synsets.append(synset)
+            for term in synset:
+                self.index.setdefault(term, []).append(synset_no)
+
+    def get_many(self, words):
+        """Get the synonyms of several words.
+
+        Args:
+            words: A list of unicode strings.
+
+        Returns:
+            A dictionary mapping each word in the thesaurus to a list of its synonyms, in the order of the dump.
+            Words not in the thesaurus are left out.
+        """
+        results = {}
+        for word in words:
+            synset_nos = self.index.get(unicodedata.normalize('NFC', word))
+            if synset_nos is not None:
+                results[word] = _collect_synonyms(word, [self.synsets[synset_no] for synset_no in synset_nos])
+        return results
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as index_file:
+            pickle.dump({'version': INDEX_VERSION, 'synsets': self.synsets, 'index': self.index}, index_file,
+                        pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a thesaurus saved before.
+
+        Raises:
+            ValueError: The index has an outdated format and must be imported again.
+        """
+        with open(path, 'rb') as index_file:
+            data = pickle.load(index_file)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError('Outdated thesaurus index: ' + path)
+        thesaurus = cls()
+        thesaurus.synsets = data['synsets']
+        thesaurus.index = data['index']
+        return thesaurus
+
+
+class MongoThesaurus(object):
+    """A thesaurus stored in a MongoDB collection.
+
+    Each document is a synset with its number as _id and its terms ('terms'), which are indexed.
+    """
+
+    def __init__(self, collection):
+        """
+        Args:
+            collection: A pymongo collection.
+        """
+        self.collection = collection
+        self._next_no = 0
+
+    def clear(self):
+        """Remove all synsets, e.g. before importing a new dump."""
+        self.collection.remove({})
+        self._next_no = 0
+
+    def ensure_index(self):
+        self.collection.ensure_index('terms')
+
+    def add_synsets(self, synsets):
+        docs = []
+        for synset in synsets:
+            docs.append({'_id': self._next_no, 'terms': list(synset)})
+            self._next_no += 1
+        if docs:
+            self.collection.insert(docs)
+
+    def get_many(self, words):
+        """Get the synonyms of several words with a single query, see FileThesaurus.get_many."""
+        keys = dict((word, unicodedata.normalize('NFC', word)) for word in words)
+        synsets_by_term = {}
+        for doc in self.collection.find({'terms': {'$in': list(set(keys.values()))}}, sort=[('_id', 1)]):
+            for term in doc['terms']:
+                synsets_by_term.setdefault(term, []).append(doc['terms'])
+        return dict((word, _collect_synonyms(word, synsets_by_term[keys[word]]))
+                    for word in words if keys[word] in synsets_by_term)
+
+
+def import_thesaurus(lines, thesaurus, batch_size=DEFAULT_BATCH_SIZE):
+    """Import an OpenThesaurus text dump in a single streaming pass.
+
+    Args:
+        lines: An iterable of unicode strings, see parse_thesaurus.
+        thesaurus: A FileThesaurus or MongoThesaurus the synsets are added to.
+        batch_size: No. of synsets added at once.
+
+    Returns:
+        The no. of synsets imported.
+    """
+    no_of_synsets = 0
+    batch = []
+    for synset in parse_thesaurus(lines):
+        batch.append(synset)
+        if len(batch) >= batch_size:
+            thesaurus.add_synsets(batch)
+            no_of_synsets += len(batch)
+            batch = []
+    thesaurus.add_synsets(batch)
+    return no_of_synsets + len(batch)
+
+
+def open_thesaurus(data_dir, db=None):
+    """Open the local thesaurus, preferring the index in the data directory over the MongoDB collection.
+
+    Args:
+        data_dir: Directory for data kept between runs, ending with a slash.
+        db: An optional pymongo database with the collection 'thesaurus'.
+
+    Returns:
+        A FileThesaurus or MongoThesaurus, or None if no thesaurus was imported.
+    """
+    index_path = data_dir + INDEX_NAME
+    if os.path.exists(index_path):
+        try:
+            return FileThesaurus.load(index_path)
+        except ValueError as e:
+            print e
+    if db is not None and db.thesaurus.find_one() is not None:
+        return MongoThesaurus(db.thesaurus)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import an OpenThesaurus text dump into the local thesaurus.')
+    parser.add_argument('path', help='path of the dump, e.g. openthesaurus.txt')
+    parser.add_argument('--mongo', action='store_true',
+                        help='import into MongoDB instead of an index in the data directory')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    with codecs.open(args.path, 'r', 'utf-8') as dump_file:
+        if args.mongo:
+            from pymongo import MongoClient
+
+            thesaurus = MongoThesaurus(MongoClient(os.environ['OPENSHIFT_MONGODB_DB_URL']).tagespoet.thesaurus)
+            thesaurus.clear()
+            no_of_synsets = import_thesaurus(dump_file, thesaurus)
+            thesaurus.ensure_index()
+        else:
+            thesaurus = FileThesaurus()
+            no_of_synsets = import_thesaurus(dump_file, thesaurus)
+            thesaurus.save(os.environ['OPENSHIFT_DATA_DIR'] + INDEX_NAME)
+    print 'Imported {0} synsets in {1:.1f} s'.format(no_of_synsets, time.time() - start_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests of the offline syllabification engine, run with 'python -m unittest discover tests'."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraper'))
+
+from syllabify import PatternTrie, Syllabifier, load_patterns, load_syllabifier, compare_with_subwords, \
+    save_validation, is_validated, DEFAULT_PATTERN_PATH
+
+
+class PatternTrieTest(unittest.TestCase):
+
+    def test_get_breaks(self):
+        # patterns of Liang's thesis
+        trie = PatternTrie([u'hy3ph', u'he2n', u'hena4', u'hen5at', u'1na', u'n2at', u'1tio', u'2io', u'o2n'])
+        self.assertEqual(trie.get_breaks(u'hyphenation'), [2, 6])
+
+    def test_word_boundaries(self):
+        trie = PatternTrie([u'.ab1', u'b1c'])
+        self.assertEqual(trie.get_breaks(u'abab'), [2])
+        self.assertEqual(trie.get_breaks(u'babc'), [3])
+
+    def test_highest_point_wins(self):
+        trie = PatternTrie([u'a1b', u'a2bc'])
+        self.assertEqual(trie.get_breaks(u'ab'), [1])
+        self.assertEqual(trie.get_breaks(u'abc'), [])
+
+
+class LoadPatternsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_tex_file(self):
+        path = os.path.join(self.directory, 'test.pat')
+        with open(path, 'wb') as pattern_file:
+            pattern_file.write(u'% comment a1b\n\\patterns{\n.ab1 b1c % trailing comment\n}\n'
+                               u'\\hyphenation{\nab-bc\n}\nä1ö\n'.encode('utf-8'))
+        trie = load_patterns(path)
+        self.assertEqual(len(trie), 3)
+        self.assertEqual(trie.get_breaks(u'abab'), [2])
+        self.assertEqual(trie.get_breaks(u'äö'), [1])
+
+
+class BundledPatternsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.syllabifier = load_syllabifier()
+
+    def test_patterns_are_bundled(self):
+        self.assertTrue(os.path.exists(DEFAULT_PATTERN_PATH))
+        self.assertIsNotNone(self.syllabifier.patterns)
+        self.assertGreater(len(self.syllabifier.patterns), 20000)
+
+    def test_split(self):
+        for word, syls in [(u'Abstimmung', [u'Ab', u'stim', u'mung']),
+                           (u'Infrastruktur', [u'In', u'fra', u'struk', u'tur']),
+                           (u'Wirtschaft', [u'Wirt', u'schaft']),
+                           (u'Bahnhof', [u'Bahn', u'hof']),
+                           (u'Museum', [u'Mu', u'se', u'um']),
+                           (u'Flüchtling', [u'Flücht', u'ling']),
+                           (u'Abend', [u'A', u'bend'])]:
+            self.assertEqual(self.syllabifier.split(word), syls)
+
+    def test_ion_special_case(self):
+        self.assertEqual(self.syllabifier.split(u'Lektion'), [u'Lek', u'tion'])
+        self.assertEqual(self.syllabifier.analyze(u'Lektion')[1], [0, 1])
+
+    def test_patterns_differ_from_rules(self):
+        self.assertEqual(Syllabifier().split(u'Abstimmung'), [u'Abs', u'tim', u'mung'])
+
+
+class ConfidenceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.syllabifier = load_syllabifier()
+
+    def test_confident(self):
+        for word in [u'Klima', u'Arbeit', u'Wirtschaft', u'Ernte', u'Bahnhof', u'Kanzlerin', u'Abstimmung', u'Mauer',
+                     u'Haus', u'Flüchtlinge']:
+            syls, stresses, confident = self.syllabifier.analyze(word)
+            self.assertTrue(confident, word)
+            self.assertEqual(stresses[0], 1, word)
+
+    def test_uncertain(self):
+        for word in [u'Infrastruktur', u'Politik', u'Europa', u'Theater', u'Museum', u'Ministerium', u'Finanzminister',
+                     u'Regierungen', u'Regierung', u'Kredit', u'Büro', u'Politiker', u'NATO']:
+            self.assertFalse(self.syllabifier.analyze(word)[2], word)
+
+    def test_clusters_uncertain_without_patterns(self):
+        self.assertFalse(Syllabifier().analyze(u'Abstimmung')[2])
+        self.assertTrue(Syllabifier().analyze(u'Sonne')[2])
+
+
+class ValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'validation.json')
+        self.syllabifier = load_syllabifier()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compare_with_subwords(self):
+        subwords = [{'word': u'Sonne', 'syls': [u'Son', u'ne'], 'stresses': [1, 0]},
+                    {'word': u'Gipfel', 'syls': [u'Gip', u'fel'], 'stresses': [0, 1]},
+                    {'word': u'Politik', 'syls': [u'Po', u'li', u'tik'], 'stresses': [0, 0, 1]}]
+        counts = compare_with_subwords(self.syllabifier, subwords)
+        self.assertEqual((counts['words'], counts['confident'], counts['same'], counts['same_syls']), (3, 2, 1, 2))
+
+    def test_is_validated(self):
+        self.assertFalse(is_validated(self.path, self.syllabifier))
+        save_validation(self.path, self.syllabifier, {'words': 1500, 'confident': 1000, 'same': 980})
+        self.assertTrue(is_validated(self.path, self.syllabifier))
+        # validation of the rules without patterns
+        self.assertFalse(is_validated(self.path, Syllabifier()))
+        save_validation(self.path, self.syllabifier, {'words': 1500, 'confident': 1000, 'same': 900})
+        self.assertFalse(is_validated(self.path, self.syllabifier))
+        save_validation(self.path, self.syllabifier, {'words': 500, 'confident': 100, 'same': 100})
+        self.assertFalse(is_validated(self.path, self.syllabifier))
+
+
+if __name__ == '__main__':
+    unittest.main()